@@ -1,315 +1,186 @@
 import discord
 from discord.ext import commands
 from discord import app_commands
-import yt_dlp
-import asyncio
-import os
-import spotipy
-from spotipy.oauth2 import SpotifyClientCredentials
-from collections import deque
-
-# --- CONFIGURACIÓN TÉCNICA ---
-YTDL_OPTIONS = {
-    'format': 'bestaudio/best',
-    'outtmpl': '%(extractor)s-%(id)s-%(title)s.%(ext)s',
-    'restrictfilenames': True,
-    'noplaylist': True,
-    'nocheckcertificate': True,
-    'ignoreerrors': False,
-    'logtostderr': False,
-    'quiet': True,
-    'no_warnings': True,
-    'default_search': 'auto',
-    'source_address': '0.0.0.0',
-}
-
-FFMPEG_OPTIONS = {
-    'before_options': '-reconnect 1 -reconnect_streamed 1 -reconnect_delay_max 5',
-    'options': '-vn',
-}
-
-ytdl = yt_dlp.YoutubeDL(YTDL_OPTIONS)
-
-# --- CLASE PARA MANEJAR LA COLA DE CADA SERVIDOR ---
-class ServerQueue:
-    def __init__(self):
-        self.queue = deque() # La lista de canciones en espera
-        self.current_track = None # La canción sonando ahora
-        self.volume = 0.5 # Volumen por defecto (50%)
+from utils.music import MusicService
+from utils.ratelimit import check_app_limit, check_prefix_limit, limiter
 
 class MusicCog(commands.Cog):
+    """
+    Solo traduce cada entrada (slash, prefijo, puente de la IA) a una llamada
+    al MusicService. La lógica de verdad vive en utils/music.py; aquí cada
+    operación se escribe una vez y devuelve (ok, mensaje).
+    """
+
     def __init__(self, bot):
         self.bot = bot
-        self.queues = {} # Diccionario para guardar las colas de cada servidor {guild_id: ServerQueue}
-        
-        # Configuración Spotify (Opcional)
-        self.sp = None
-        client_id = os.getenv("SPOTIFY_CLIENT_ID")
-        client_secret = os.getenv("SPOTIFY_CLIENT_SECRET")
-        if client_id and client_secret and client_id != "tu_id_aqui":
-            try:
-                self.sp = spotipy.Spotify(auth_manager=SpotifyClientCredentials(client_id=client_id, client_secret=client_secret))
-                print("✅ Spotify conectado.")
-            except:
-                print("⚠️ Error en credenciales Spotify.")
-        else:
-            print("ℹ️ Modo YouTube Puro (Sin Spotify).")
+        self.music = MusicService(bot)
 
-    def get_queue(self, guild_id):
-        """Obtiene o crea la cola para un servidor específico"""
-        if guild_id not in self.queues:
-            self.queues[guild_id] = ServerQueue()
-        return self.queues[guild_id]
+    # --- NÚCLEO COMÚN ---
 
-    async def get_spotify_track_info(self, url):
-        """Convierte Link de Spotify -> Texto de búsqueda"""
-        if not self.sp: return None
+    async def do_join(self, guild, member):
+        if not member.voice:
+            return False, "❌ Entra a un canal de voz."
         try:
-            loop = asyncio.get_event_loop()
-            track = await loop.run_in_executor(None, lambda: self.sp.track(url))
-            return f"{track['artists'][0]['name']} - {track['name']} audio"
-        except:
-            return None
-
-    # --- SISTEMA DE REPRODUCCIÓN ---
-    def play_next(self, guild, vc):
-        """Función recursiva que se llama cuando termina una canción"""
-        sq = self.get_queue(guild.id)
-        
-        if len(sq.queue) > 0:
-            # Sacamos la siguiente canción de la cola
-            next_url, next_title = sq.queue.popleft()
-            sq.current_track = next_title
-
-            # Función interna para procesar el audio sin bloquear
-            async def start_playback():
-                try:
-                    loop = self.bot.loop
-                    data = await loop.run_in_executor(None, lambda: ytdl.extract_info(next_url, download=False))
-                    
-                    if 'entries' in data: data = data['entries'][0]
-                    filename = data['url']
-                    
-                    source = discord.FFmpegPCMAudio(filename, **FFMPEG_OPTIONS)
-                    source = discord.PCMVolumeTransformer(source, volume=sq.volume)
-                    
-                    # El 'after' llama a play_next otra vez cuando esta termine
-                    vc.play(source, after=lambda e: self.play_next(guild, vc))
-                    
-                except Exception as e:
-                    print(f"Error reproduciendo {next_title}: {e}")
-                    self.play_next(guild, vc) # Si falla, intenta la siguiente
-
-            # Ejecutamos la tarea asíncrona de forma segura desde el hilo principal
-            asyncio.run_coroutine_threadsafe(start_playback(), self.bot.loop)
-        else:
-            # Se acabó la cola
-            sq.current_track = None
-            # Opcional: Desconectar automáticamente tras un tiempo
-            # asyncio.run_coroutine_threadsafe(vc.disconnect(), self.bot.loop)
+            await self.music.get_player(guild).connect(member.voice.channel)
+        except Exception:
+            return False, "❌ No pude conectar."
+        return True, "👍 **Conectado.**"
+
+    async def do_play(self, guild, member, busqueda):
+        ok, msg = await self.do_join(guild, member)
+        if not ok:
+            return ok, msg
+
+        url, title = await self.music.resolve(busqueda)
+        if url is None:
+            return False, title # Aquí 'title' es el mensaje de error
+
+        if await self.music.get_player(guild).enqueue(url, title):
+            return True, f"▶️ **Reproduciendo:** {title}"
+        return True, f"📝 **Añadido a la cola:** {title}"
+
+    async def do_skip(self, guild):
+        if await self.music.get_player(guild).skip():
+            return True, "⏭️ **Saltada!**"
+        return False, "❌ No hay nada sonando."
+
+    async def do_stop(self, guild):
+        if await self.music.get_player(guild).stop():
+            return True, "🛑 **Desconectado y cola borrada.**"
+        return False, "❌ No estoy conectado."
+
+    async def reply(self, interaction, result):
+        ok, msg = result
+        await interaction.response.send_message(msg, ephemeral=not ok)
 
     # --- COMANDOS INTERACTIVOS ---
 
     @app_commands.command(name="play", description="Añade una canción a la cola")
     @app_commands.describe(busqueda="Link de YouTube/Spotify o nombre de la canción")
-    async def play(self, interaction: discord.Interaction, busqueda: str):
+    async def play_slash(self, interaction: discord.Interaction, busqueda: str):
         if not interaction.user.voice:
             return await interaction.response.send_message("❌ Entra a un canal de voz.", ephemeral=True)
 
+        # El limitador va después de la comprobación de voz: así no gasta fichas en vano
+        check_app_limit(interaction, "ytdl")
         await interaction.response.defer()
-
-        # 1. Manejo de Spotify
-        if "spotify.com" in busqueda:
-            if not self.sp:
-                # Fallback manual
-                if "track" in busqueda:
-                     return await interaction.followup.send("⚠️ Spotify desactivado temporalmente. Por favor escribe el nombre de la canción.")
-            else:
-                converted = await self.get_spotify_track_info(busqueda)
-                if converted: busqueda = converted
-
-        # 2. Conexión a Voz
-        if not interaction.guild.voice_client:
-            try:
-                vc = await interaction.user.voice.channel.connect()
-            except:
-                return await interaction.followup.send("❌ No pude conectar.")
-        else:
-            vc = interaction.guild.voice_client
-
-        # 3. Añadir a la Cola (Lógica PRO)
-        sq = self.get_queue(interaction.guild.id)
-        
-        # Obtenemos info básica antes de procesar (para mostrar título rápido)
-        # Nota: Hacemos una búsqueda rápida para obtener título y URL
-        try:
-            loop = self.bot.loop
-            data = await loop.run_in_executor(None, lambda: ytdl.extract_info(busqueda, download=False))
-            
-            if 'entries' in data: data = data['entries'][0]
-            
-            title = data.get('title', 'Canción desconocida')
-            url = data.get('webpage_url', busqueda) # URL limpia para guardar en cola
-
-            # Añadimos a la cola interna
-            sq.queue.append((url, title))
-
-            if not vc.is_playing() and not vc.is_paused():
-                # Si no está sonando nada, arrancamos el ciclo
-                self.play_next(interaction.guild, vc)
-                await interaction.followup.send(f"▶️ **Reproduciendo:** {title}")
-            else:
-                # Si ya suena algo, solo avisamos que se encoló
-                await interaction.followup.send(f"📝 **Añadido a la cola:** {title}")
-
-        except Exception as e:
-            await interaction.followup.send(f"❌ Error al buscar: {e}")
+        ok, msg = await self.do_play(interaction.guild, interaction.user, busqueda)
+        await interaction.followup.send(msg)
 
     @app_commands.command(name="skip", description="Salta a la siguiente canción")
-    async def skip(self, interaction: discord.Interaction):
-        vc = interaction.guild.voice_client
-        if not vc or not vc.is_playing():
-            return await interaction.response.send_message("❌ No hay nada sonando.", ephemeral=True)
-        
-        vc.stop() # Esto fuerza el 'after' del play(), llamando a play_next
-        await interaction.response.send_message("⏭️ **Saltada!**")
+    async def skip_slash(self, interaction: discord.Interaction):
+        await self.reply(interaction, await self.do_skip(interaction.guild))
 
     @app_commands.command(name="pause", description="Pausa la música")
     async def pause(self, interaction: discord.Interaction):
-        vc = interaction.guild.voice_client
-        if vc and vc.is_playing():
-            vc.pause()
+        if await self.music.get_player(interaction.guild).pause():
             await interaction.response.send_message("⏸️ **Pausado.**")
         else:
             await interaction.response.send_message("❌ No se puede pausar ahora.", ephemeral=True)
 
     @app_commands.command(name="resume", description="Reanuda la música")
     async def resume(self, interaction: discord.Interaction):
-        vc = interaction.guild.voice_client
-        if vc and vc.is_paused():
-            vc.resume()
+        if await self.music.get_player(interaction.guild).resume():
             await interaction.response.send_message("▶️ **Reanudando...**")
         else:
             await interaction.response.send_message("❌ No está pausado.", ephemeral=True)
 
     @app_commands.command(name="volumen", description="Ajusta el volumen (0-100)")
     async def volumen(self, interaction: discord.Interaction, nivel: int):
-        vc = interaction.guild.voice_client
-        if not vc or not vc.source:
-            return await interaction.response.send_message("❌ No hay música sonando.", ephemeral=True)
-
-        sq = self.get_queue(interaction.guild.id)
-        
-        # Convertir 0-100 a 0.0-1.0
-        nuevo_vol = max(0, min(100, nivel)) / 100
-        vc.source.volume = nuevo_vol
-        sq.volume = nuevo_vol # Guardar para la siguiente canción
-        
-        await interaction.response.send_message(f"🔊 Volumen al **{nivel}%**")
+        if await self.music.get_player(interaction.guild).set_volume(nivel):
+            await interaction.response.send_message(f"🔊 Volumen al **{nivel}%**")
+        else:
+            await interaction.response.send_message("❌ No hay música sonando.", ephemeral=True)
 
     @app_commands.command(name="queue", description="Muestra la lista de reproducción")
     async def queue_list(self, interaction: discord.Interaction):
-        sq = self.get_queue(interaction.guild.id)
-        if not sq.queue and not sq.current_track:
+        player = self.music.get_player(interaction.guild)
+        if not player.queue and not player.current_track:
             return await interaction.response.send_message("📭 La cola está vacía.")
 
-        msg = f"**Sonando ahora:** 🎵 {sq.current_track}\n\n**En espera:**\n"
-        for i, (url, title) in enumerate(sq.queue, 1):
+        msg = f"**Sonando ahora:** 🎵 {player.current_track}\n\n**En espera:**\n"
+        for i, (url, title) in enumerate(list(player.queue), 1):
             msg += f"`{i}.` {title}\n"
             if i >= 10: # Limite visual
                 msg += "... y más."
                 break
-        
+
         await interaction.response.send_message(msg)
 
     @app_commands.command(name="stop", description="Limpia la cola y desconecta")
-    async def stop(self, interaction: discord.Interaction):
-        sq = self.get_queue(interaction.guild.id)
-        sq.queue.clear() # Borrar cola
-        sq.current_track = None
-        
-        if interaction.guild.voice_client:
-            await interaction.guild.voice_client.disconnect()
-            await interaction.response.send_message("🛑 **Desconectado y cola borrada.**")
-        else:
-            await interaction.response.send_message("❌ No estoy conectado.", ephemeral=True)
+    async def stop_slash(self, interaction: discord.Interaction):
+        await self.reply(interaction, await self.do_stop(interaction.guild))
 
     # =========================================================
     # COMANDOS CON PREFIX (!play, !skip)
     # =========================================================
     @commands.command(name="play", aliases=["p"])
-    async def play(self, ctx, *, query: str):
+    async def play_prefix(self, ctx, *, query: str):
         """Comando para humanos: !play despacito"""
-        await self._add_to_queue_logic(ctx, query)
+        if not ctx.author.voice:
+            return await ctx.send("❌ Entra a un canal de voz.")
+
+        check_prefix_limit(ctx, "ytdl")
+        async with ctx.typing():
+            ok, msg = await self.do_play(ctx.guild, ctx.author, query)
+        await ctx.send(msg)
 
     @commands.command(name="skip", aliases=["s", "next"])
-    async def skip(self, ctx):
+    async def skip_prefix(self, ctx):
         """Salta la canción actual"""
-        vc = ctx.guild.voice_client
-        if vc and vc.is_playing():
-            vc.stop() # Esto dispara el 'after' de _play_next
-            await ctx.send("⏭️ **Saltada.**")
-        else:
-            await ctx.send("❌ No hay nada sonando.")
+        ok, msg = await self.do_skip(ctx.guild)
+        await ctx.send(msg)
 
     @commands.command(name="stop", aliases=["leave", "disconnect"])
-    async def stop(self, ctx):
+    async def stop_prefix(self, ctx):
         """Desconecta al bot y borra la cola"""
-        vc = ctx.guild.voice_client
-        if vc:
-            # Limpiar cola
-            if ctx.guild.id in self.queues:
-                self.queues[ctx.guild.id] = []
-            await vc.disconnect()
-            await ctx.send("👋 **Adiós.**")
-        else:
-            await ctx.send("❌ No estoy conectado.")
+        ok, msg = await self.do_stop(ctx.guild)
+        await ctx.send("👋 **Adiós.**" if ok else msg)
 
     @commands.command(name="join")
-    async def join(self, ctx):
-        if ctx.author.voice:
-            await ctx.author.voice.channel.connect()
-            await ctx.send("👍 **Conectado.**")
-        else:
-            await ctx.send("❌ Entra a un canal primero.")
+    async def join_prefix(self, ctx):
+        ok, msg = await self.do_join(ctx.guild, ctx.author)
+        await ctx.send(msg)
 
     # =========================================================
     # PUENTE PARA GEMINI (IA)
     # =========================================================
-    # La IA llama a estas funciones exactas.
-    # Reutilizamos la lógica de arriba pasando el objeto 'message'.
+    # La IA llama a estas funciones exactas (play_query, skip, stop, join, leave)
+    # pasando el objeto 'message'. Por eso los métodos de los comandos llevan
+    # sufijo (_slash/_prefix): el nombre del comando lo da `name=`.
+    # Usan el mismo núcleo que los comandos de arriba.
 
     async def play_query(self, message, query):
-        """Gemini llama a esto. Reutilizamos la lógica de !play"""
-        await self._add_to_queue_logic(message, query)
+        """Gemini llama a esto. Misma lógica y límites que !play"""
+        # Igual que /play y .play: sin canal de voz no se gastan fichas
+        if not message.author.voice:
+            return await message.channel.send("entra a un canal vos primero")
+        wait, scope = limiter.acquire("ytdl", message.author.id, message.guild.id)
+        if wait:
+            return await message.channel.send(f"⏳ Demasiadas canciones seguidas, prueba en {wait:.0f}s.")
+        ok, msg = await self.do_play(message.guild, message.author, query)
+        await message.channel.send(msg)
 
     async def skip(self, message):
         """Gemini llama a esto."""
-        # Simulamos un contexto o actuamos directo
-        vc = message.guild.voice_client
-        if vc and vc.is_playing():
-            vc.stop()
+        ok, msg = await self.do_skip(message.guild)
+        if ok:
             await message.channel.send("⏭️ (Saltado por IA)")
 
     async def stop(self, message):
         """Gemini llama a esto."""
-        vc = message.guild.voice_client
-        if vc:
-            self.queues[message.guild.id] = []
-            await vc.disconnect()
+        ok, msg = await self.do_stop(message.guild)
+        if ok:
             await message.channel.send("👋 (Desconectado por IA)")
 
     async def join(self, message):
         """Gemini llama a esto."""
-        if message.author.voice:
-            await message.author.voice.channel.connect()
-            await message.channel.send("👍")
-        else:
-            await message.channel.send("entra a un canal vos primero")
-    
+        ok, msg = await self.do_join(message.guild, message.author)
+        await message.channel.send("👍" if ok else "entra a un canal vos primero")
+
     async def leave(self, message):
         """Alias para stop usado por Gemini"""
         await self.stop(message)
 
 async def setup(bot):
-    await bot.add_cog(MusicCog(bot))
\ No newline at end of file
+    await bot.add_cog(MusicCog(bot))
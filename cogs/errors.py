@@ -2,6 +2,7 @@ import discord
 from discord import app_commands
 from discord.ext import commands
 import logging
+from utils import metrics
 
 logger = logging.getLogger("bot")
 
@@ -15,7 +16,50 @@ class ErrorHandler(commands.Cog):
         # Asignar el manejador de errores global al árbol de comandos
         self.bot.tree.on_error = self.on_app_command_error
 
+    @commands.Cog.listener()
+    async def on_command_error(self, ctx: commands.Context, error: commands.CommandError):
+        # Errores lanzados dentro del comando (p. ej. el limitador) llegan envueltos
+        if isinstance(error, commands.CommandInvokeError) and isinstance(error.original, commands.CommandError):
+            error = error.original
+
+        # 1. Comando inexistente: se ignora para no responder a cualquier "!algo"
+        if isinstance(error, commands.CommandNotFound):
+            return
+
+        # 2. Cooldown (limitador)
+        elif isinstance(error, commands.CommandOnCooldown):
+            await ctx.send(f"⏳ **Calma:** Espera `{error.retry_after:.2f}s` antes de usar este comando de nuevo.", delete_after=10)
+
+        # 3. Falta un argumento (ej: ".play" sin canción)
+        elif isinstance(error, commands.MissingRequiredArgument):
+            await ctx.send(f"❌ **Falta** `{error.param.name}`. Uso: `{ctx.prefix}{ctx.command.qualified_name} {ctx.command.signature}`")
+
+        elif isinstance(error, commands.BadArgument):
+            await ctx.send(f"❌ **Argumento inválido:** {error}")
+
+        # 4. Permisos
+        elif isinstance(error, commands.MissingPermissions):
+            missing = ", ".join(error.missing_permissions)
+            await ctx.send(f"⛔ **Acceso Denegado:** No tienes permisos suficientes.\nTe falta: `{missing}`")
+
+        elif isinstance(error, commands.BotMissingPermissions):
+            missing = ", ".join(error.missing_permissions)
+            await ctx.send(f"🔒 **No puedo hacer eso:** Me faltan permisos en este servidor.\nNecesito: `{missing}`")
+
+        elif isinstance(error, commands.NoPrivateMessage):
+            await ctx.send("❌ Este comando solo funciona dentro de un servidor.")
+
+        elif isinstance(error, commands.CheckFailure):
+            await ctx.send("⛔ **Acceso Denegado:** No puedes usar este comando aquí.")
+
+        # 5. Errores genéricos: con traza completa en el log
+        else:
+            logger.error(f"Error en comando {ctx.command}: {error}", exc_info=error)
+            await ctx.send("❌ Ocurrió un error inesperado. Revisa los logs.")
+
     async def on_app_command_error(self, interaction: discord.Interaction, error: app_commands.AppCommandError):
+        metrics.observe_interaction(interaction, "error")
+
         # 1. Falta de Permisos del Usuario
         if isinstance(error, app_commands.MissingPermissions):
             missing = ", ".join(error.missing_permissions)
@@ -41,7 +85,7 @@ class ErrorHandler(commands.Cog):
             
         # 4. Errores genéricos
         else:
-            logger.error(f"Error en comando: {error}")
+            logger.error(f"Error en comando: {error}", exc_info=error)
             # Si ya se respondió (defer), usamos followup, si no, response
             if interaction.response.is_done():
                 await interaction.followup.send("❌ Ocurrió un error inesperado. Revisa los logs.", ephemeral=True)
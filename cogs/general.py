@@ -1,24 +1,98 @@
 import discord
 from discord import app_commands
-from discord.ext import commands
+from discord.ext import commands, tasks
 import logging
 import platform
 import datetime
+import time
 from typing import Optional
+from utils import metrics, ratelimit
 
 # 1. Configurar Logger
 logger = logging.getLogger("bot")
 
+# Cada proceso publica sus números aquí para que /botinfo muestre el total
+SHARD_STATS_NS = "shard_stats"
+SHARD_STATS_TTL = 180 # Si un worker deja de publicar, sus datos caducan
+
 class General(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         # Guardamos la hora de inicio para calcular el Uptime
         self.start_time = datetime.datetime.now()
+        self.publish_stats.start()
+
+    def cog_unload(self):
+        self.publish_stats.cancel()
 
     @commands.Cog.listener()
     async def on_ready(self):
         logger.info("✅ Cog General cargado y listo.")
 
+    # --- ESTADÍSTICAS COMPARTIDAS ENTRE SHARDS ---
+    @tasks.loop(seconds=60)
+    async def publish_stats(self):
+        await self.bot.store.set(SHARD_STATS_NS, self.bot.worker_id, self.local_stats(), ttl=SHARD_STATS_TTL)
+
+    def local_stats(self):
+        return {
+            "guilds": len(self.bot.guilds),
+            "users": sum(g.member_count or 0 for g in self.bot.guilds),
+            "latency": self.bot.latency,
+            "updated": time.time(),
+        }
+
+    @publish_stats.before_loop
+    async def before_publish_stats(self):
+        await self.bot.wait_until_ready()
+
+    async def get_global_stats(self):
+        """Suma los datos publicados por todos los workers (incluido este)."""
+        # Solo lectura: los nuestros salen de memoria (frescos y sin escribir en SQLite)
+        stats = await self.bot.store.items(SHARD_STATS_NS)
+        stats[str(self.bot.worker_id)] = self.local_stats()
+        stats = stats.values()
+        guilds = sum(s["guilds"] for s in stats)
+        users = sum(s["users"] for s in stats)
+        latencies = [s["latency"] for s in stats if s["latency"] == s["latency"]] # Descarta NaN
+        latency = sum(latencies) / len(latencies) if latencies else 0.0
+        return guilds, users, latency, len(stats)
+
+    def format_metrics(self):
+        """Resumen corto de utils.metrics para el embed de /botinfo."""
+        def ms(value):
+            return "—" if value is None else f"{value * 1000:.0f}ms"
+
+        lines = [
+            f"Comandos p95/p99: `{ms(metrics.command_latency.percentile(0.95))}` / `{ms(metrics.command_latency.percentile(0.99))}`",
+            f"Lag del loop p99: `{ms(metrics.loop_lag.percentile(0.99))}`",
+            f"Executor: `{metrics.executor_active.get()}/{metrics.executor_max.get()}` hilos, `{metrics.executor_queue.get()}` en cola",
+        ]
+
+        # Comando más lento (p95) para saber dónde mirar
+        slowest = None
+        for key in metrics.command_latency.series:
+            name = dict(key)["command"]
+            p95 = metrics.command_latency.percentile(0.95, command=name)
+            if slowest is None or p95 > slowest[1]:
+                slowest = (name, p95)
+        if slowest:
+            lines.append(f"Más lento (p95): `{slowest[0]}` {ms(slowest[1])}")
+
+        throttles = ratelimit.throttled.total()
+        if throttles:
+            by_backend = {}
+            for key, value in ratelimit.throttled.values.items():
+                backend = dict(key)["backend"]
+                by_backend[backend] = by_backend.get(backend, 0) + value
+            lines.append("Frenados: " + ", ".join(f"`{b}` {n}" for b, n in by_backend.items()))
+
+        for cache in ("music_search", "music_stream", "ai_memory"):
+            rate = metrics.cache_hit_rate(cache)
+            if rate is not None:
+                lines.append(f"Caché `{cache}`: `{rate:.0%}` aciertos")
+        return "\n".join(lines)
+
     # --- COMANDO PING ---
     @app_commands.command(name="ping", description="Verifica la latencia y conexión con la API.")
     async def ping(self, interaction: discord.Interaction):
@@ -115,14 +189,22 @@ class General(commands.Cog):
         # Calcular Uptime
         uptime = datetime.datetime.now() - self.start_time
         uptime_str = str(uptime).split('.')[0] # Quitar milisegundos feos
-        
+
+        # Leer el SharedStore puede esperar a otros procesos: no arriesgamos los 3s de Discord
+        await interaction.response.defer()
+
         embed = discord.Embed(title="🤖 Panel de Control", color=discord.Color.dark_grey())
         
         embed.add_field(name="Versiones", value=f"Python: `{platform.python_version()}`\nDiscord.py: `{discord.__version__}`", inline=True)
-        embed.add_field(name="Estadísticas", value=f"Servidores: `{len(self.bot.guilds)}`\nLatencia: `{round(self.bot.latency * 1000)}ms`", inline=True)
+        guilds, users, latency, workers = await self.get_global_stats()
+        embed.add_field(name="Estadísticas", value=f"Servidores: `{guilds}`\nUsuarios: `{users}`\nLatencia: `{round(latency * 1000)}ms`", inline=True)
+        if workers > 1 or self.bot.shard_count:
+            shard = interaction.guild.shard_id if interaction.guild else 0
+            embed.add_field(name="Shards", value=f"Procesos: `{workers}`\nShards: `{self.bot.shard_count}`\nEste servidor: `#{shard}`", inline=True)
         embed.add_field(name="Tiempo Activo", value=f"```\n{uptime_str}\n```", inline=False)
+        embed.add_field(name="Rendimiento (este proceso)", value=self.format_metrics(), inline=False)
         
-        await interaction.response.send_message(embed=embed)
+        await interaction.followup.send(embed=embed)
 
 # --- SETUP OBLIGATORIO ---
 async def setup(bot):
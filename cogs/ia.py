@@ -1,35 +1,62 @@
 import discord
 from discord.ext import commands
-import ollama
 import asyncio
+import os
+import weakref
+from utils.lazy import lazy_import
+from utils import metrics
+from utils.ratelimit import limiter
+
+# El cliente de Ollama se importa la primera vez que alguien habla con la IA
+ollama = lazy_import("ollama")
+
+# La memoria caduca tras este tiempo sin hablar (antes se perdía al reiniciar)
+AI_MEMORY_TTL = int(os.getenv("AI_MEMORY_TTL", str(6 * 3600)))
 
 class AIChat(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.model = "llama3.2"
-        # Diccionario para guardar la memoria: {user_id: [lista_de_mensajes]}
-        self.memory = {}
+        # La memoria vive en el SharedStore (namespace "ai_memory") para que un
+        # usuario conserve su contexto aunque hable en guilds de otros shards.
+        # {user_id: [lista_de_mensajes]}
+        self.memory_ns = "ai_memory"
+        # Un lock por usuario: leer -> Ollama -> guardar es una sola operación,
+        # si no dos menciones seguidas se pisan y se pierde un intercambio.
+        # Weak: el lock desaparece cuando nadie lo está usando.
+        self.locks = weakref.WeakValueDictionary()
+
+    def user_lock(self, user_id):
+        lock = self.locks.get(user_id)
+        if lock is None:
+            lock = self.locks[user_id] = asyncio.Lock()
+        return lock
 
-    def get_user_context(self, user_id, user_name):
+    async def get_user_context(self, user_id, user_name):
         """Inicializa o recupera el contexto del usuario."""
-        if user_id not in self.memory:
+        context = await self.bot.store.get(self.memory_ns, user_id)
+        metrics.record_cache("ai_memory", context is not None)
+        if context is None:
             # Mensaje de sistema para darle personalidad al bot
-            self.memory[user_id] = [
+            context = [
                 {'role': 'system', 'content': f'Eres un asistente útil y sarcástico llamado KKs-Bot. Hablas con {user_name}. Recuerda su nombre y sé directo.'}
             ]
-        return self.memory[user_id]
+        return context
 
     async def process_ai_request(self, user_id, user_name, prompt):
         """Maneja la lógica de Ollama con memoria."""
-        context = self.get_user_context(user_id, user_name)
+        async with self.user_lock(user_id):
+            return await self._process_locked(user_id, user_name, prompt)
+
+    async def _process_locked(self, user_id, user_name, prompt):
+        context = await self.get_user_context(user_id, user_name)
         
         # Añadimos el nuevo mensaje del usuario al contexto
         context.append({'role': 'user', 'content': prompt})
 
+        # Lambda para que el import perezoso (si aún no ocurrió) también corra en el hilo
         response = await asyncio.to_thread(
-            ollama.chat,
-            model=self.model,
-            messages=context
+            lambda: ollama.chat(model=self.model, messages=context)
         )
 
         bot_response = response['message']['content']
@@ -39,8 +66,9 @@ class AIChat(commands.Cog):
 
         # Limitamos la memoria a los últimos 10 mensajes para ahorrar RAM
         if len(context) > 11: # 1 system + 10 chat
-            self.memory[user_id] = [context[0]] + context[-10:]
+            context = [context[0]] + context[-10:]
 
+        await self.bot.store.set(self.memory_ns, user_id, context, ttl=AI_MEMORY_TTL)
         return bot_response
 
     @commands.Cog.listener()
@@ -58,6 +86,12 @@ class AIChat(commands.Cog):
                 await message.reply("¿Me mencionaste? Dime algo, no leo mentes todavía.")
                 return
 
+            # Un solo usuario no puede acaparar Ollama para todo el mundo
+            wait, _ = limiter.acquire("ollama", message.author.id, message.guild.id if message.guild else None)
+            if wait:
+                await message.reply(f"⏳ Dame un respiro, vuelve a preguntar en `{wait:.0f}s`.", delete_after=10)
+                return
+
             async with message.channel.typing():
                 try:
                     respuesta = await self.process_ai_request(
@@ -72,8 +106,11 @@ class AIChat(commands.Cog):
     @commands.command(name="olvida")
     async def olvida(self, ctx):
         """Limpia la memoria del usuario que lo solicita."""
-        if ctx.author.id in self.memory:
-            del self.memory[ctx.author.id]
+        async with self.user_lock(ctx.author.id):
+            existed = await self.bot.store.get(self.memory_ns, ctx.author.id) is not None
+            if existed:
+                await self.bot.store.delete(self.memory_ns, ctx.author.id)
+        if existed:
             await ctx.send(f"✅ Memoria borrada para {ctx.author.name}. Soy un lienzo en blanco.")
 
 async def setup(bot):
@@ -1,14 +1,94 @@
 import discord
 from discord import app_commands
 from discord.ext import commands
+import asyncio
 import datetime
 import logging
+import re
+import time
+from utils.modlog import CaseStore
 
 logger = logging.getLogger("bot")
 
+# --- CONFIGURACIÓN DE OPERACIONES MASIVAS ---
+BULK_CONCURRENCY = 5 # Peticiones simultáneas; discord.py ya espera los buckets de rate limit
+BULK_BAN_CHUNK = 200 # Máximo de usuarios por llamada a guild.bulk_ban
+BULK_DELETE_CHUNK = 100 # Máximo de mensajes por bulk delete
+BULK_DELETE_MAX_AGE = datetime.timedelta(days=14) # Más viejos no se pueden borrar en bloque
+PURGE_MAX = 10000
+PROGRESS_EVERY = 2.0 # Segundos mínimos entre ediciones del mensaje de progreso
+ACTION_TIME_LIMIT = datetime.timedelta(minutes=13) # El token de la interacción caduca a los 15 min: paramos antes
+CASES_PER_PAGE = 10
+
+# Nombres legibles de cada acción registrada en el historial
+ACTION_LABELS = {
+    "kick": "👢 Expulsión",
+    "ban": "⛔ Baneo",
+    "timeout": "🤐 Aislamiento",
+    "clear": "🧹 Limpieza",
+    "purge": "🧹 Purga",
+}
+
+class Progress:
+    """Un único mensaje de progreso que se va editando (sin spamear el canal)."""
+    def __init__(self, interaction, title, total, ephemeral=False):
+        self.interaction = interaction
+        self.title = title
+        self.total = total
+        self.ephemeral = ephemeral
+        self.done = 0
+        self.failed = 0
+        self.message = None
+        self.last_edit = 0
+        self.editable = True
+        self.timed_out = False
+
+    def render(self, final=False):
+        icon = "✅" if final else "⏳"
+        return f"{icon} **{self.title}:** {self.done}/{self.total} completados" + (f" · ❌ {self.failed} fallidos" if self.failed else "")
+
+    async def start(self):
+        self.message = await self.interaction.followup.send(self.render(), ephemeral=self.ephemeral, wait=True)
+
+    def expired(self):
+        """True si hay que parar antes de que caduque el token (cuenta desde la interacción)."""
+        if discord.utils.utcnow() - self.interaction.created_at > ACTION_TIME_LIMIT:
+            self.timed_out = True
+        return self.timed_out
+
+    async def advance(self, ok=0, failed=0):
+        self.done += ok
+        self.failed += failed
+        # Limitamos las ediciones: editar también consume rate limit
+        if self.editable and time.monotonic() - self.last_edit >= PROGRESS_EVERY:
+            self.last_edit = time.monotonic()
+            try:
+                await self.message.edit(content=self.render())
+            except discord.HTTPException as e:
+                # Un fallo al editar no debe contar como fallo de la acción
+                logger.warning(f"No se pudo actualizar el progreso de '{self.title}': {e}")
+                self.editable = False
+
+    async def finish(self, extra=""):
+        if self.timed_out:
+            pending = self.total - self.done - self.failed
+            extra += f"\n⌛ Se alcanzó el tiempo máximo ({pending} sin procesar); vuelve a lanzar el comando para seguir."
+        try:
+            await self.message.edit(content=self.render(final=True) + extra)
+        except discord.HTTPException:
+            # Token de la interacción caducado: el resultado va como mensaje normal
+            await self.interaction.channel.send(f"{self.interaction.user.mention} " + self.render(final=True) + extra)
+
 class Moderation(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        self.cases = CaseStore()
+
+    async def cog_load(self):
+        await self.cases.open()
+
+    async def cog_unload(self):
+        await self.cases.close()
 
     @commands.Cog.listener()
     async def on_ready(self):
@@ -33,6 +113,7 @@ class Moderation(commands.Cog):
             
             await interaction.response.send_message(embed=embed)
             logger.info(f"{interaction.user} expulsó a {usuario}")
+            self.cases.record(interaction.guild.id, "kick", interaction.user.id, usuario.id, razon)
         except Exception as e:
             await interaction.response.send_message(f"❌ Error al expulsar: {e}", ephemeral=True)
 
@@ -56,6 +137,7 @@ class Moderation(commands.Cog):
             
             await interaction.response.send_message(embed=embed)
             logger.info(f"{interaction.user} baneó a {usuario}")
+            self.cases.record(interaction.guild.id, "ban", interaction.user.id, usuario.id, razon)
         except Exception as e:
             await interaction.response.send_message(f"❌ Error al banear: {e}", ephemeral=True)
 
@@ -71,6 +153,7 @@ class Moderation(commands.Cog):
         duration = datetime.timedelta(minutes=minutos)
         try:
             await usuario.timeout(duration, reason=razon)
+            self.cases.record(interaction.guild.id, "timeout", interaction.user.id, usuario.id, razon, minutos=minutos)
             await interaction.response.send_message(f"🤐 **{usuario.mention}** ha sido aislado por **{minutos} minutos**.\n📝 Razón: {razon}")
         except Exception as e:
             await interaction.response.send_message(f"❌ Error: {e}", ephemeral=True)
@@ -89,6 +172,365 @@ class Moderation(commands.Cog):
         
         await interaction.followup.send(f"🧹 Se han borrado **{len(deleted)}** mensajes.", ephemeral=True)
         logger.info(f"{interaction.user} borró {len(deleted)} mensajes en #{interaction.channel.name}")
+        self.cases.record(interaction.guild.id, "clear", interaction.user.id, channel_id=interaction.channel.id, count=len(deleted))
+
+    # =========================================================
+    # OPERACIONES MASIVAS (Limpieza de raids)
+    # =========================================================
+
+    def select_targets(self, interaction, ids, unido_hace_minutos, patron, allow_outside=False):
+        """
+        Construye la lista de objetivos. Los filtros se combinan (AND):
+        - ids: lista de IDs/menciones separadas por espacios o comas
+        - unido_hace_minutos: miembros que entraron en los últimos N minutos
+        - patron: regex (sin distinguir mayúsculas) sobre nombre, apodo y nombre global
+        Devuelve (objetivos, omitidos, fuera). Con allow_outside y `ids` como único
+        filtro, los IDs que no están en el servidor se añaden como discord.Object
+        (sirve para banear cuentas que ya se fueron); `fuera` es cuántos son.
+        Con otros filtros no se pueden comprobar (no hay fecha de entrada ni nombre).
+        """
+        guild = interaction.guild
+        moderator = interaction.user
+        outside = []
+
+        if ids:
+            wanted = {int(x) for x in re.findall(r"\d{15,20}", ids)}
+            candidates = []
+            for user_id in wanted:
+                member = guild.get_member(user_id)
+                if member:
+                    candidates.append(member)
+                elif allow_outside and not (unido_hace_minutos or patron):
+                    outside.append(discord.Object(id=user_id))
+        else:
+            candidates = list(guild.members)
+
+        if unido_hace_minutos:
+            since = discord.utils.utcnow() - datetime.timedelta(minutes=unido_hace_minutos)
+            candidates = [m for m in candidates if m.joined_at and m.joined_at >= since]
+
+        if patron:
+            regex = re.compile(patron, re.IGNORECASE)
+            candidates = [m for m in candidates if any(regex.search(n) for n in (m.name, m.display_name, m.global_name or "") if n)]
+
+        # Misma jerarquía que los comandos individuales, y nunca al bot, al dueño o a uno mismo
+        targets = []
+        skipped = 0
+        for member in candidates:
+            if (member.id in (moderator.id, guild.owner_id, self.bot.user.id)
+                    or member.top_role >= moderator.top_role
+                    or member.top_role >= guild.me.top_role):
+                skipped += 1
+            else:
+                targets.append(member)
+
+        return targets + outside, skipped, len(outside)
+
+    async def run_bulk(self, progress, targets, action, on_success=None):
+        """Ejecuta `action(objetivo)` para cada objetivo con concurrencia acotada."""
+        semaphore = asyncio.Semaphore(BULK_CONCURRENCY)
+
+        async def worker(target):
+            async with semaphore:
+                if progress.expired():
+                    return # Quedan sin procesar; finish() lo indica
+                try:
+                    await action(target)
+                except discord.HTTPException as e:
+                    logger.warning(f"Acción masiva falló para {target.id}: {e}")
+                    await progress.advance(failed=1)
+                    return
+                if on_success:
+                    on_success(target)
+                await progress.advance(ok=1)
+
+        await asyncio.gather(*(worker(t) for t in targets))
+
+    async def prepare_bulk(self, interaction, ids, unido_hace_minutos, patron, confirmar, verb, allow_outside=False):
+        """Filtros comunes + modo vista previa. Devuelve la lista de objetivos o None."""
+        if not (ids or unido_hace_minutos or patron):
+            await interaction.response.send_message("❌ Indica al menos un filtro: `ids`, `unido_hace_minutos` o `patron`.", ephemeral=True)
+            return None
+        if patron and len(patron) > 100:
+            await interaction.response.send_message("❌ El patrón es demasiado largo (máx. 100 caracteres).", ephemeral=True)
+            return None
+
+        try:
+            targets, skipped, outside = self.select_targets(interaction, ids, unido_hace_minutos, patron, allow_outside)
+        except re.error as e:
+            await interaction.response.send_message(f"❌ Regex inválida: {e}", ephemeral=True)
+            return None
+
+        if not targets:
+            await interaction.response.send_message(f"📭 Ningún usuario coincide (omitidos por jerarquía: {skipped}).", ephemeral=True)
+            return None
+
+        if not confirmar:
+            # Vista previa: no tocamos a nadie hasta que el moderador confirme
+            preview = ", ".join(f"`{getattr(t, 'name', t.id)}`" for t in targets[:20])
+            more = f" y {len(targets) - 20} más" if len(targets) > 20 else ""
+            gone = f", {outside} ya no están en el servidor" if outside else ""
+            await interaction.response.send_message(
+                f"🔎 Se van a {verb} **{len(targets)}** usuarios (omitidos por jerarquía: {skipped}{gone}):\n{preview}{more}\n\n"
+                f"Repite el comando con `confirmar: True` para ejecutarlo.",
+                ephemeral=True
+            )
+            return None
+
+        await interaction.response.defer()
+        return targets
+
+    # --- MASSBAN ---
+    @app_commands.command(name="massban", description="Banea usuarios en masa por IDs, fecha de entrada o nombre.")
+    @app_commands.describe(
+        ids="IDs o menciones separadas por espacios",
+        unido_hace_minutos="Solo quienes entraron en los últimos N minutos",
+        patron="Regex sobre el nombre (ej: ^spam\\d+)",
+        borrar_mensajes="Borrar mensajes de los últimos días (0-7)",
+        confirmar="False = solo vista previa"
+    )
+    @app_commands.checks.has_permissions(ban_members=True)
+    async def massban(self, interaction: discord.Interaction, ids: str = None, unido_hace_minutos: int = None, patron: str = None,
+                      borrar_mensajes: int = 0, razon: str = "Limpieza de raid", confirmar: bool = False):
+        targets = await self.prepare_bulk(interaction, ids, unido_hace_minutos, patron, confirmar, "banear", allow_outside=True)
+        if targets is None:
+            return
+
+        progress = Progress(interaction, "Baneo masivo", len(targets))
+        await progress.start()
+        reason = f"Por: {interaction.user} | Razón: {razon}"
+        seconds = max(0, min(7, borrar_mensajes)) * 86400
+
+        def record(target):
+            self.cases.record(interaction.guild.id, "ban", interaction.user.id, target.id, razon, bulk=True)
+
+        # bulk_ban: hasta 200 usuarios por petición, mucho más barato que 200 bans sueltos
+        for i in range(0, len(targets), BULK_BAN_CHUNK):
+            if progress.expired():
+                break
+            chunk = targets[i:i + BULK_BAN_CHUNK]
+            try:
+                result = await interaction.guild.bulk_ban(chunk, reason=reason, delete_message_seconds=seconds)
+            except discord.HTTPException as e:
+                logger.warning(f"bulk_ban falló ({e}), reintentando uno a uno")
+                await self.run_bulk(progress, chunk, lambda t: interaction.guild.ban(t, reason=reason, delete_message_seconds=seconds), record)
+                continue
+            for user in result.banned:
+                record(user)
+            await progress.advance(ok=len(result.banned), failed=len(result.failed))
+
+        await progress.finish()
+        logger.info(f"{interaction.user} baneó en masa a {progress.done} usuarios en {interaction.guild}")
+
+    # --- MASSKICK ---
+    @app_commands.command(name="masskick", description="Expulsa usuarios en masa por IDs, fecha de entrada o nombre.")
+    @app_commands.describe(
+        ids="IDs o menciones separadas por espacios",
+        unido_hace_minutos="Solo quienes entraron en los últimos N minutos",
+        patron="Regex sobre el nombre",
+        confirmar="False = solo vista previa"
+    )
+    @app_commands.checks.has_permissions(kick_members=True)
+    async def masskick(self, interaction: discord.Interaction, ids: str = None, unido_hace_minutos: int = None, patron: str = None,
+                       razon: str = "Limpieza de raid", confirmar: bool = False):
+        targets = await self.prepare_bulk(interaction, ids, unido_hace_minutos, patron, confirmar, "expulsar")
+        if targets is None:
+            return
+
+        progress = Progress(interaction, "Expulsión masiva", len(targets))
+        await progress.start()
+        reason = f"Por: {interaction.user} | Razón: {razon}"
+        await self.run_bulk(progress, targets, lambda m: m.kick(reason=reason),
+                            lambda m: self.cases.record(interaction.guild.id, "kick", interaction.user.id, m.id, razon, bulk=True))
+
+        await progress.finish()
+        logger.info(f"{interaction.user} expulsó en masa a {progress.done} usuarios en {interaction.guild}")
+
+    # --- MASSTIMEOUT ---
+    @app_commands.command(name="masstimeout", description="Aísla usuarios en masa por IDs, fecha de entrada o nombre.")
+    @app_commands.describe(
+        minutos="Duración del aislamiento en minutos (máx. 28 días)",
+        ids="IDs o menciones separadas por espacios",
+        unido_hace_minutos="Solo quienes entraron en los últimos N minutos",
+        patron="Regex sobre el nombre",
+        confirmar="False = solo vista previa"
+    )
+    @app_commands.checks.has_permissions(moderate_members=True)
+    async def masstimeout(self, interaction: discord.Interaction, minutos: int, ids: str = None, unido_hace_minutos: int = None,
+                          patron: str = None, razon: str = "Limpieza de raid", confirmar: bool = False):
+        targets = await self.prepare_bulk(interaction, ids, unido_hace_minutos, patron, confirmar, "aislar")
+        if targets is None:
+            return
+
+        progress = Progress(interaction, "Aislamiento masivo", len(targets))
+        await progress.start()
+        minutos = max(1, min(minutos, 28 * 24 * 60)) # Máximo que permite Discord
+        duration = datetime.timedelta(minutes=minutos)
+        await self.run_bulk(progress, targets, lambda m: m.timeout(duration, reason=razon),
+                            lambda m: self.cases.record(interaction.guild.id, "timeout", interaction.user.id, m.id, razon, bulk=True, minutos=minutos))
+
+        await progress.finish()
+        logger.info(f"{interaction.user} aisló en masa a {progress.done} usuarios en {interaction.guild}")
+
+    # --- PURGE (Clear sin límite de 100) ---
+    @app_commands.command(name="purge", description="Borra mensajes en bloque con filtros (sin límite de 100).")
+    @app_commands.describe(
+        cantidad=f"Mensajes a revisar hacia atrás (máx. {PURGE_MAX})",
+        autor="Solo mensajes de este usuario",
+        contiene="Solo mensajes que contengan este texto",
+        solo_bots="Solo mensajes de bots"
+    )
+    @app_commands.checks.has_permissions(manage_messages=True)
+    async def purge(self, interaction: discord.Interaction, cantidad: int, autor: discord.User = None,
+                    contiene: str = None, solo_bots: bool = False):
+        cantidad = max(1, min(cantidad, PURGE_MAX))
+        await interaction.response.defer(ephemeral=True)
+
+        def matches(msg):
+            if msg.pinned:
+                return False
+            if autor and msg.author.id != autor.id:
+                return False
+            if contiene and contiene.lower() not in msg.content.lower():
+                return False
+            if solo_bots and not msg.author.bot:
+                return False
+            return True
+
+        channel = interaction.channel
+        progress = Progress(interaction, f"Purga en #{channel.name}", cantidad, ephemeral=True)
+        await progress.start()
+
+        deleted = 0
+        batch = []
+        old = []
+        cutoff = discord.utils.utcnow() - BULK_DELETE_MAX_AGE + datetime.timedelta(minutes=1) # Margen de seguridad
+
+        async def flush():
+            nonlocal deleted
+            if batch:
+                try:
+                    await channel.delete_messages(batch)
+                    deleted += len(batch)
+                except discord.HTTPException as e:
+                    # Un lote fallido no aborta la purga: se cuenta y seguimos
+                    logger.warning(f"Fallo borrando {len(batch)} mensajes en #{channel.name}: {e}")
+                    progress.failed += len(batch)
+                batch.clear()
+
+        try:
+            async for msg in channel.history(limit=cantidad):
+                if progress.expired():
+                    break
+                await progress.advance(ok=1)
+                if not matches(msg):
+                    continue
+                if msg.created_at < cutoff:
+                    old.append(msg)
+                else:
+                    batch.append(msg)
+                    if len(batch) >= BULK_DELETE_CHUNK:
+                        await flush()
+            await flush()
+
+            # Los mensajes de más de 14 días solo se pueden borrar de uno en uno (bucket muy estricto)
+            if old and not progress.timed_out:
+                progress.title = f"Borrando {len(old)} mensajes antiguos en #{channel.name}"
+                progress.total = len(old)
+                progress.done = 0
+                for msg in old:
+                    if progress.expired():
+                        break
+                    try:
+                        await msg.delete()
+                        deleted += 1
+                        await progress.advance(ok=1)
+                    except discord.HTTPException:
+                        await progress.advance(failed=1)
+        except discord.HTTPException as e:
+            # Ej: sin permiso para leer el historial
+            logger.error(f"Error en la purga de #{channel.name}: {e}")
+            progress.failed += 1
+        finally:
+            logger.info(f"{interaction.user} purgó {deleted} mensajes en #{channel.name}")
+            self.cases.record(interaction.guild.id, "purge", interaction.user.id, channel_id=channel.id, count=deleted,
+                              author_id=autor.id if autor else None)
+
+        await progress.finish(f"\n🧹 Borrados **{deleted}** mensajes.")
+
+    # =========================================================
+    # HISTORIAL DE CASOS
+    # =========================================================
+
+    def format_case(self, row):
+        label = ACTION_LABELS.get(row["action"], row["action"])
+        when = f"<t:{int(row['created_at'])}:R>"
+        target = f"<@{row['target_id']}>" if row["target_id"] else "—"
+        line = f"`#{row['id']}` {label} · {target} por <@{row['moderator_id']}> · {when}"
+        if row["reason"]:
+            line += f"\n└ {row['reason'][:100]}"
+        return line
+
+    async def send_case_page(self, interaction, title, **filters):
+        """Muestra los casos con botones para pasar de página (paginación por cursor)."""
+        view = CasePaginator(self, interaction.user.id, title, filters)
+        embed = await view.load_page(interaction.guild.id)
+        await interaction.response.send_message(embed=embed, view=view, ephemeral=True)
+
+    @app_commands.command(name="casos", description="Historial de moderación de un usuario.")
+    @app_commands.describe(usuario="Usuario del que ver el historial")
+    @app_commands.checks.has_permissions(moderate_members=True)
+    async def casos(self, interaction: discord.Interaction, usuario: discord.User):
+        await self.send_case_page(interaction, f"📋 Casos de {usuario}", target_id=usuario.id)
+
+    @app_commands.command(name="casos_moderador", description="Acciones realizadas por un moderador.")
+    @app_commands.describe(moderador="Moderador a revisar", dias="Solo los últimos N días (0 = todo)")
+    @app_commands.checks.has_permissions(moderate_members=True)
+    async def casos_moderador(self, interaction: discord.Interaction, moderador: discord.User, dias: int = 7):
+        since = time.time() - dias * 86400 if dias > 0 else None
+        periodo = f"últimos {dias} días" if dias > 0 else "todo"
+        await self.send_case_page(interaction, f"🛡️ Acciones de {moderador} ({periodo})", moderator_id=moderador.id, since=since)
+
+class CasePaginator(discord.ui.View):
+    """Botones Anterior/Siguiente. Guarda los cursores (ids) en vez de offsets."""
+    def __init__(self, cog, owner_id, title, filters):
+        super().__init__(timeout=300)
+        self.cog = cog
+        self.owner_id = owner_id
+        self.title = title
+        self.filters = filters
+        self.cursors = [None] # Cursor de inicio de cada página visitada
+        self.next_cursor = None
+
+    async def load_page(self, guild_id):
+        # Pedimos uno de más para saber si existe página siguiente
+        rows = await self.cog.cases.query(guild_id, before_id=self.cursors[-1], limit=CASES_PER_PAGE + 1, **self.filters)
+        has_next = len(rows) > CASES_PER_PAGE
+        rows = rows[:CASES_PER_PAGE]
+        self.next_cursor = rows[-1]["id"] if has_next else None
+
+        self.previous.disabled = len(self.cursors) == 1
+        self.next.disabled = self.next_cursor is None
+
+        embed = discord.Embed(title=self.title, color=discord.Color.blurple())
+        embed.description = "\n".join(self.cog.format_case(r) for r in rows) or "📭 Sin casos registrados."
+        embed.set_footer(text=f"Página {len(self.cursors)}")
+        return embed
+
+    async def interaction_check(self, interaction):
+        return interaction.user.id == self.owner_id
+
+    @discord.ui.button(label="◀ Anterior", style=discord.ButtonStyle.secondary)
+    async def previous(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.cursors.pop()
+        embed = await self.load_page(interaction.guild.id)
+        await interaction.response.edit_message(embed=embed, view=self)
+
+    @discord.ui.button(label="Siguiente ▶", style=discord.ButtonStyle.secondary)
+    async def next(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.cursors.append(self.next_cursor)
+        embed = await self.load_page(interaction.guild.id)
+        await interaction.response.edit_message(embed=embed, view=self)
 
 async def setup(bot):
     await bot.add_cog(Moderation(bot))
\ No newline at end of file
@@ -1,9 +1,16 @@
 import discord
 from discord import app_commands
 from discord.ext import commands
-from PIL import Image, ImageDraw, ImageFont, ImageOps
 import io
 import logging
+from utils.lazy import lazy_import
+from utils.ratelimit import limiter, app_limit
+
+# Pillow solo se carga cuando se genera la primera imagen
+Image = lazy_import("PIL.Image")
+ImageDraw = lazy_import("PIL.ImageDraw")
+ImageFont = lazy_import("PIL.ImageFont")
+ImageOps = lazy_import("PIL.ImageOps")
 
 logger = logging.getLogger("bot")
 
@@ -77,6 +84,13 @@ class Welcome(commands.Cog):
                 channel = discord.utils.get(guild.text_channels, name="general")
 
         if channel:
+            # En un raid entran cientos de cuentas: si el renderizador está saturado
+            # damos la bienvenida solo con texto
+            wait, _ = limiter.acquire("render", member.id, guild.id)
+            if wait:
+                await channel.send(f"Hola {member.mention}, bienvenido a **{guild.name}**!")
+                return
+
             try:
                 # Generar imagen (esto corre en otro hilo para no congelar el bot)
                 buffer = await self.bot.loop.run_in_executor(None, self.generate_welcome_image, member)
@@ -89,6 +103,7 @@ class Welcome(commands.Cog):
 
     # Comando para probar la bienvenida sin salir y entrar
     @app_commands.command(name="testwelcome", description="Simula una bienvenida (Admin)")
+    @app_limit("render") # Encima: se comprueba después del permiso
     @app_commands.checks.has_permissions(administrator=True)
     async def testwelcome(self, interaction: discord.Interaction):
         await interaction.response.defer()
@@ -0,0 +1,96 @@
+"""
+Lanzador multi-proceso: reparte los shards del bot entre varios procesos.
+
+Uso:
+    python launcher.py                  # shards recomendados por Discord, 1 proceso por núcleo
+    SHARD_COUNT=8 WORKERS=4 python launcher.py
+
+Cada worker ejecuta un AutoShardedBot con su rango de shards. Los datos que
+cruzan shards viven en el SharedStore (utils/shared_store.py).
+"""
+import asyncio
+import multiprocessing
+import os
+import time
+import aiohttp
+from dotenv import load_dotenv
+
+load_dotenv()
+
+GATEWAY_URL = "https://discord.com/api/v10/gateway/bot"
+
+
+async def fetch_recommended_shards(token):
+    """Pregunta a Discord cuántos shards recomienda para este bot."""
+    headers = {"Authorization": f"Bot {token}"}
+    async with aiohttp.ClientSession() as session:
+        async with session.get(GATEWAY_URL, headers=headers) as resp:
+            resp.raise_for_status()
+            data = await resp.json()
+    return data["shards"]
+
+
+def split_shards(shard_count, workers):
+    """Divide range(shard_count) en `workers` bloques contiguos lo más parejos posible."""
+    workers = max(1, min(workers, shard_count))
+    base, extra = divmod(shard_count, workers)
+    ranges = []
+    start = 0
+    for i in range(workers):
+        size = base + (1 if i < extra else 0)
+        ranges.append(list(range(start, start + size)))
+        start += size
+    return ranges
+
+
+def run_worker(worker_id, shard_ids, shard_count):
+    """Punto de entrada de cada proceso hijo."""
+    # Debe fijarse antes de importar main: decide la clase base del Bot
+    os.environ["SHARDED"] = "1"
+    import main
+
+    try:
+        asyncio.run(main.main(shard_ids=shard_ids, shard_count=shard_count, worker_id=worker_id))
+    except KeyboardInterrupt:
+        pass
+
+
+def launch():
+    token = os.getenv("DISCORD_TOKEN")
+    shard_count = int(os.getenv("SHARD_COUNT", "0")) or asyncio.run(fetch_recommended_shards(token))
+    workers = int(os.getenv("WORKERS", "0")) or os.cpu_count() or 1
+    ranges = split_shards(shard_count, workers)
+
+    print(f"🚀 {shard_count} shards repartidos en {len(ranges)} procesos")
+    # Los hijos lo heredan: utils/ratelimit.py reparte los límites globales entre ellos
+    os.environ["WORKER_COUNT"] = str(len(ranges))
+
+    ctx = multiprocessing.get_context("spawn")
+    processes = {}
+    for worker_id, shard_ids in enumerate(ranges):
+        proc = ctx.Process(target=run_worker, args=(worker_id, shard_ids, shard_count), name=f"bot-worker-{worker_id}")
+        proc.start()
+        processes[worker_id] = proc
+        print(f"🧩 Worker {worker_id} (pid {proc.pid}) -> shards {shard_ids}")
+
+    # Supervisión: si un worker muere, se relanza con sus mismos shards
+    try:
+        while True:
+            time.sleep(5)
+            for worker_id, proc in list(processes.items()):
+                if not proc.is_alive():
+                    print(f"⚠️ Worker {worker_id} terminó (código {proc.exitcode}), relanzando...")
+                    shard_ids = ranges[worker_id]
+                    new_proc = ctx.Process(target=run_worker, args=(worker_id, shard_ids, shard_count), name=f"bot-worker-{worker_id}")
+                    new_proc.start()
+                    processes[worker_id] = new_proc
+    except KeyboardInterrupt:
+        print("🛑 Deteniendo workers...")
+        for proc in processes.values():
+            proc.terminate()
+        for proc in processes.values():
+            proc.join()
+
+
+if __name__ == '__main__':
+    launch()
@@ -0,0 +1,308 @@
+"""
+Discord falso (gateway + REST) para las pruebas de carga.
+
+Corre en su propio hilo y event loop para no robarle tiempo al bot que se
+está midiendo. Solo implementa lo que usan los cogs; cualquier otra ruta
+REST responde 200 con un objeto vacío.
+"""
+import asyncio
+import io
+import itertools
+import json
+import re
+import threading
+import time
+from aiohttp import web, WSMsgType
+
+API_PREFIX = "/api/v10"
+
+# Todos los permisos: los usuarios sintéticos pueden usar /testwelcome, etc.
+ALL_PERMISSIONS = str((1 << 50) - 1)
+
+
+def _png_bytes():
+    """Avatar de 128x128 para que Welcome tenga algo que descargar."""
+    from PIL import Image
+    buffer = io.BytesIO()
+    Image.new("RGB", (128, 128), color=(114, 137, 218)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def _json(data):
+    # discord.py compara el content-type exacto (sin "; charset=...")
+    return web.Response(body=json.dumps(data).encode("utf-8"), content_type="application/json")
+
+
+class FakeDiscord:
+    def __init__(self, guilds=1, members=200, text_channels=5, shards=1):
+        self._ids = itertools.count(1_000_000_000_000_000_000)
+        self.bot_user = self.user_payload(self.new_id(), "LoadBot", bot=True)
+        self.app_id = self.new_id()
+        self.guilds = [self._build_guild(members, text_channels) for _ in range(guilds)]
+        self.commands = {} # {nombre: id} registrados por tree.sync
+        self.shards = shards # Lo que recomienda /gateway/bot (AutoShardedBot con SHARDED=1)
+
+        self.loop = None
+        self.port = None
+        self._sockets = {} # {ws: [shard_id, shard_count]}
+        self._seq = itertools.count(1)
+        self._avatar = None
+        self._ready = threading.Event()
+
+        # Callback(tipo, clave, instante) que el harness usa para medir latencias
+        self.on_response = lambda kind, key, when: None
+
+    # --- DATOS SINTÉTICOS ---
+
+    def new_id(self):
+        return next(self._ids)
+
+    def user_payload(self, user_id, name, bot=False):
+        return {"id": str(user_id), "username": name, "global_name": name, "discriminator": "0", "avatar": None, "bot": bot}
+
+    def member_payload(self, user, guild_id, roles=None):
+        return {
+            "user": user,
+            "roles": roles or [],
+            "joined_at": "2024-01-01T00:00:00+00:00",
+            "deaf": False,
+            "mute": False,
+            "flags": 0,
+            "nick": None,
+        }
+
+    def _build_guild(self, members, text_channels):
+        guild_id = self.new_id()
+        channels = [{"id": str(self.new_id()), "type": 0, "name": f"canal-{i}", "position": i, "permission_overwrites": []} for i in range(text_channels)]
+        voice = {"id": str(self.new_id()), "type": 2, "name": "voz", "position": text_channels, "permission_overwrites": [], "bitrate": 64000, "user_limit": 0}
+        users = [self.user_payload(self.new_id(), f"user{i}") for i in range(members)]
+        return {
+            "id": str(guild_id),
+            "name": f"Guild de carga {guild_id % 1000}",
+            "icon": None,
+            "owner_id": users[0]["id"],
+            "system_channel_id": channels[0]["id"],
+            "roles": [{"id": str(guild_id), "name": "@everyone", "permissions": ALL_PERMISSIONS, "position": 0, "color": 0, "hoist": False, "managed": False, "mentionable": False}],
+            "channels": channels + [voice],
+            "members": [self.member_payload(u, guild_id) for u in users] + [self.member_payload(self.bot_user, guild_id)],
+            "member_count": members + 1,
+            "large": False,
+            "unavailable": False,
+            "voice_states": [],
+            "presences": [],
+            "emojis": [],
+            "stickers": [],
+            "threads": [],
+            "stage_instances": [],
+            "guild_scheduled_events": [],
+            "features": [],
+            "premium_tier": 0,
+            "premium_subscription_count": 0,
+            "verification_level": 0,
+            "default_message_notifications": 0,
+            "explicit_content_filter": 0,
+            "mfa_level": 0,
+            "nsfw_level": 0,
+            "preferred_locale": "es-ES",
+            "afk_timeout": 300,
+            "joined_at": "2024-01-01T00:00:00+00:00",
+        }
+
+    def message_payload(self, channel_id, author, content="", guild_id=None, **extra):
+        data = {
+            "id": str(self.new_id()),
+            "channel_id": str(channel_id),
+            "author": author,
+            "content": content,
+            "timestamp": "2024-01-01T00:00:00+00:00",
+            "edited_timestamp": None,
+            "tts": False,
+            "mention_everyone": False,
+            "mentions": [],
+            "mention_roles": [],
+            "attachments": [],
+            "embeds": [],
+            "pinned": False,
+            "type": 0,
+        }
+        if guild_id:
+            data["guild_id"] = str(guild_id)
+        data.update(extra)
+        return data
+
+    # --- CICLO DE VIDA ---
+
+    def start(self):
+        """Arranca el servidor en un hilo propio. Devuelve el puerto."""
+        thread = threading.Thread(target=self._run, name="fake-discord", daemon=True)
+        thread.start()
+        self._ready.wait()
+        return self.port
+
+    def _run(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self._avatar = _png_bytes()
+
+        app = web.Application(client_max_size=16 * 1024 * 1024)
+        app.router.add_get("/", self.gateway)
+        app.router.add_get(API_PREFIX + "/gateway", self.get_gateway)
+        app.router.add_get(API_PREFIX + "/gateway/bot", self.get_gateway)
+        app.router.add_get(API_PREFIX + "/users/@me", self.get_me)
+        app.router.add_get(API_PREFIX + "/oauth2/applications/@me", self.get_application)
+        app.router.add_put(API_PREFIX + "/applications/{app}/commands", self.put_commands)
+        app.router.add_post(API_PREFIX + "/interactions/{id}/{token}/callback", self.interaction_callback)
+        app.router.add_post(API_PREFIX + "/webhooks/{app}/{token}", self.followup)
+        app.router.add_patch(API_PREFIX + "/webhooks/{app}/{token}/messages/{message}", self.followup)
+        app.router.add_post(API_PREFIX + "/channels/{channel}/messages", self.create_message)
+        app.router.add_get("/avatars/{path:.*}", self.avatar)
+        app.router.add_get("/embed/avatars/{path:.*}", self.avatar)
+        app.router.add_route("*", "/{path:.*}", self.fallback)
+
+        runner = web.AppRunner(app, access_log=None)
+        self.loop.run_until_complete(runner.setup())
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        self.loop.run_until_complete(site.start())
+        self.port = site._server.sockets[0].getsockname()[1]
+        self._ready.set()
+        self.loop.run_forever()
+
+    # --- GATEWAY ---
+
+    async def gateway(self, request):
+        ws = web.WebSocketResponse(max_msg_size=0)
+        await ws.prepare(request)
+        await ws.send_json({"op": 10, "d": {"heartbeat_interval": 41250}})
+
+        async for msg in ws:
+            if msg.type != WSMsgType.TEXT:
+                continue
+            payload = json.loads(msg.data)
+            if payload["op"] == 1: # Heartbeat
+                await ws.send_json({"op": 11})
+            elif payload["op"] == 2: # Identify
+                # Cada shard solo recibe sus guilds: (guild_id >> 22) % shard_count
+                shard = payload["d"].get("shard") or [0, 1]
+                self._sockets[ws] = shard
+                guilds = [g for g in self.guilds if self.shard_for(g["id"], shard[1]) == shard[0]]
+                await self._send(ws, "READY", {
+                    "v": 10,
+                    "user": self.bot_user,
+                    "guilds": [{"id": g["id"], "unavailable": True} for g in guilds],
+                    "session_id": f"fake-session-{shard[0]}",
+                    "resume_gateway_url": f"ws://127.0.0.1:{self.port}/",
+                    "application": {"id": str(self.app_id), "flags": 0},
+                    "shard": shard,
+                })
+                for guild in guilds:
+                    await self._send(ws, "GUILD_CREATE", guild)
+
+        self._sockets.pop(ws, None)
+        return ws
+
+    @staticmethod
+    def shard_for(guild_id, shard_count):
+        return (int(guild_id) >> 22) % shard_count
+
+    async def _send(self, ws, event, data):
+        await ws.send_json({"op": 0, "t": event, "s": next(self._seq), "d": data})
+
+    def dispatch(self, event, data):
+        """Envía un evento al shard de su guild (seguro desde otro hilo)."""
+        guild_id = data.get("guild_id")
+
+        async def send():
+            for ws, (shard_id, shard_count) in list(self._sockets.items()):
+                if guild_id is None or self.shard_for(guild_id, shard_count) == shard_id:
+                    await self._send(ws, event, data)
+        asyncio.run_coroutine_threadsafe(send(), self.loop)
+
+    # --- REST ---
+
+    async def get_gateway(self, request):
+        return _json({
+            "url": f"ws://127.0.0.1:{self.port}/",
+            "shards": self.shards,
+            "session_start_limit": {"total": 1000, "remaining": 1000, "reset_after": 0, "max_concurrency": self.shards},
+        })
+
+    async def get_me(self, request):
+        return _json(self.bot_user)
+
+    async def get_application(self, request):
+        return _json({
+            "id": str(self.app_id),
+            "name": "LoadBot",
+            "icon": None,
+            "description": "",
+            "bot_public": True,
+            "bot_require_code_grant": False,
+            "verify_key": "0" * 64,
+            "flags": 0,
+            "owner": self.bot_user,
+        })
+
+    async def put_commands(self, request):
+        commands = await request.json()
+        for command in commands:
+            command["id"] = str(self.commands.setdefault(command["name"], self.new_id()))
+            command["application_id"] = str(self.app_id)
+            command["version"] = "1"
+        return _json(commands)
+
+    async def _read_payload(self, request):
+        """JSON normal o multipart (cuando se adjuntan archivos)."""
+        if request.content_type.startswith("multipart/"):
+            form = await request.post()
+            return json.loads(form.get("payload_json", "{}"))
+        if request.can_read_body:
+            return await request.json()
+        return {}
+
+    async def interaction_callback(self, request):
+        now = time.perf_counter()
+        body = await self._read_payload(request)
+        self.on_response("interaction_ack", request.match_info["id"], now)
+
+        response = {"interaction": {"id": request.match_info["id"], "type": 2}}
+        data = body.get("data") or {}
+        if body.get("type") == 4: # Mensaje directo como respuesta
+            channel_id = self.guilds[0]["channels"][0]["id"]
+            message = self.message_payload(channel_id, self.bot_user, data.get("content") or "", embeds=data.get("embeds") or [])
+            response["interaction"]["response_message_id"] = message["id"]
+            response["resource"] = {"type": 4, "message": message}
+        else:
+            response["resource"] = {"type": body.get("type", 5)}
+        return _json(response)
+
+    async def followup(self, request):
+        now = time.perf_counter()
+        body = await self._read_payload(request)
+        self.on_response("interaction_followup", request.match_info["token"], now)
+        channel_id = self.guilds[0]["channels"][0]["id"]
+        return _json(self.message_payload(channel_id, self.bot_user, body.get("content") or "", webhook_id=str(self.app_id)))
+
+    async def create_message(self, request):
+        now = time.perf_counter()
+        body = await self._read_payload(request)
+        channel_id = request.match_info["channel"]
+
+        reference = body.get("message_reference")
+        if reference:
+            self.on_response("reply", reference["message_id"], now)
+        else:
+            # Bienvenidas: "Hola <@id>, ..." -> la clave es el id del miembro.
+            # Respuestas de comandos con prefijo (ctx.send): la clave es el canal
+            # y run.py las empareja por orden de envío.
+            mention = re.search(r"<@!?(\d+)>", body.get("content") or "")
+            self.on_response("channel_message", mention.group(1) if mention else channel_id, now)
+
+        return _json(self.message_payload(channel_id, self.bot_user, body.get("content") or ""))
+
+    async def avatar(self, request):
+        return web.Response(body=self._avatar, content_type="image/png")
+
+    async def fallback(self, request):
+        if request.method == "DELETE" or request.path.endswith("/typing"):
+            return web.Response(status=204)
+        return _json({})
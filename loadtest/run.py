@@ -0,0 +1,403 @@
+"""
+Prueba de carga de todo el bot contra un Discord falso.
+
+Arranca el Bot real (main.Bot) con todos los cogs, lo conecta a
+loadtest/fake_discord.py y reproduce una mezcla de eventos sintéticos a
+ritmo constante. Al final imprime throughput, latencias p95/p99 por
+comando, lag del event loop y crecimiento de memoria.
+
+Uso (desde la raíz del repo):
+    python -m loadtest.run --rate 50 --duration 60
+    python -m loadtest.run --mix "slash:ping=5,mention=1" --json resultado.json
+    python -m loadtest.run --shards 2      # AutoShardedBot (SHARDED=1), como un worker del launcher
+
+Limitaciones: no hay servidor de voz falso, así que /play se usa con
+usuarios que no están en un canal de voz (camino de validación + cola).
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+from collections import defaultdict, deque
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Mezcla por defecto: {tipo_de_evento: peso}
+DEFAULT_MIX = {
+    "slash:ping": 20,
+    "slash:botinfo": 5,
+    "slash:serverinfo": 5,
+    "slash:userinfo": 10,
+    "slash:avatar": 5,
+    "slash:queue": 10,
+    "slash:play": 5,
+    "slash:testwelcome": 2,
+    "prefix:play": 3,
+    "prefix:olvida": 3,
+    "mention": 10,
+    "member_join": 10,
+    "voice": 10,
+}
+
+# Opciones de los slash commands que las necesitan
+SLASH_OPTIONS = {
+    "play": [{"name": "busqueda", "type": 3, "value": "lofi hip hop"}],
+}
+
+PREFIX_CONTENT = {
+    "play": ".play lofi hip hop",
+    "olvida": ".olvida",
+}
+
+# Prefijos que pueden no contestar (.olvida sin memoria guardada). No entran en
+# la correlación por canal: si esperaran respuesta, desalinearían la cola.
+PREFIX_SILENT = {"olvida"}
+
+
+def percentile(samples, q):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def rss_mb():
+    """Memoria residente actual (Linux) o el pico si no hay /proc."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def parse_mix(text):
+    if not text:
+        return DEFAULT_MIX
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+class LoadTest:
+    def __init__(self, fake, bot, mix, rate, duration):
+        self.fake = fake
+        self.bot = bot
+        self.mix = mix
+        self.rate = rate
+        self.duration = duration
+
+        self.guild = fake.guilds[0]
+        members = [m["user"] for m in self.guild["members"] if not m["user"].get("bot")]
+        # Los de voz van aparte: si un usuario en voz usa /play, el bot intentaría conectar
+        split = max(1, len(members) // 5)
+        self.voice_users = members[:split]
+        self.users = members[split:] or members
+        self.text_channels = [c for c in self.guild["channels"] if c["type"] == 0]
+        self.voice_channel = next(c for c in self.guild["channels"] if c["type"] == 2)
+        self.in_voice = set()
+
+        self.sent = {} # {clave: (tipo, instante)}
+        self.aliases = {} # {token: id de la interacción} para los followups
+        self.sent_count = defaultdict(int)
+        self.ack = defaultdict(list) # {tipo: [latencias hasta la primera respuesta]}
+        self.done = defaultdict(list) # {tipo: [latencias hasta la última respuesta]}
+        self.last_response = {}
+        # ctx.send no lleva referencia ni mención: la respuesta de un comando con
+        # prefijo se asocia al más antiguo pendiente de ese canal (orden de envío)
+        self.prefix_pending = defaultdict(deque) # {canal: deque(ids de mensaje)}
+        self.rss_samples = []
+        self.executor_queue_samples = []
+
+        fake.on_response = self.on_response
+
+    # --- GENERACIÓN DE EVENTOS ---
+
+    def on_response(self, kind, key, when):
+        # Llega desde el hilo del servidor falso; solo tocamos dicts (atómico con el GIL)
+        key = self.aliases.get(key, str(key))
+        if kind == "channel_message" and key in self.prefix_pending:
+            pending = self.prefix_pending[key]
+            if not pending:
+                return
+            key = pending.popleft()
+        entry = self.sent.get(key)
+        if entry is None:
+            return
+        event, started = entry
+        if key not in self.last_response:
+            self.ack[event].append(when - started)
+        self.last_response[key] = when - started
+
+    def track(self, key, event):
+        self.sent[str(key)] = (event, time.perf_counter())
+        self.sent_count[event] += 1
+
+    def send_slash(self, name):
+        user = random.choice(self.users)
+        channel = random.choice(self.text_channels)
+        interaction_id = self.fake.new_id()
+        token = f"tok{interaction_id}"
+        data = {
+            "id": str(interaction_id),
+            "application_id": str(self.fake.app_id),
+            "type": 2,
+            "token": token,
+            "version": 1,
+            "guild_id": self.guild["id"],
+            "channel_id": channel["id"],
+            "channel": {**channel, "guild_id": self.guild["id"]},
+            "member": {**self.fake.member_payload(user, self.guild["id"]), "permissions": "2251799813685247"},
+            "data": {"id": str(self.fake.commands.get(name, 0)), "name": name, "type": 1, "options": SLASH_OPTIONS.get(name, [])},
+            "locale": "es-ES",
+            "guild_locale": "es-ES",
+            "app_permissions": "2251799813685247",
+            "entitlements": [],
+            "attachment_size_limit": 10 * 1024 * 1024,
+            "authorizing_integration_owners": {"0": self.guild["id"]},
+            "context": 0,
+        }
+        # El ack llega por id y los followups por token: ambos cuentan para la misma interacción
+        self.track(interaction_id, f"slash:{name}")
+        self.aliases[token] = str(interaction_id)
+        self.fake.dispatch("INTERACTION_CREATE", data)
+
+    def send_message(self, content, event, mentions=()):
+        user = random.choice(self.users)
+        channel = random.choice(self.text_channels)
+        message = self.fake.message_payload(
+            channel["id"], user, content, guild_id=self.guild["id"],
+            member=self.fake.member_payload(user, self.guild["id"]),
+            mentions=list(mentions)
+        )
+        kind, _, name = event.partition(":")
+        if kind == "prefix" and name in PREFIX_SILENT:
+            self.sent_count[event] += 1 # Solo cuenta el envío, como "voice"
+        else:
+            self.track(message["id"], event)
+            if kind == "prefix":
+                self.prefix_pending[channel["id"]].append(message["id"])
+        self.fake.dispatch("MESSAGE_CREATE", message)
+
+    def send_member_join(self):
+        user = self.fake.user_payload(self.fake.new_id(), f"raider{random.randint(0, 10**6)}")
+        self.track(user["id"], "member_join")
+        self.fake.dispatch("GUILD_MEMBER_ADD", {**self.fake.member_payload(user, self.guild["id"]), "guild_id": self.guild["id"]})
+
+    def send_voice(self):
+        user = random.choice(self.voice_users)
+        joining = user["id"] not in self.in_voice
+        (self.in_voice.add if joining else self.in_voice.discard)(user["id"])
+        self.sent_count["voice"] += 1 # Sin respuesta esperada: solo cuenta el listener
+        self.fake.dispatch("VOICE_STATE_UPDATE", {
+            "guild_id": self.guild["id"],
+            "channel_id": self.voice_channel["id"] if joining else None,
+            "user_id": user["id"],
+            "member": self.fake.member_payload(user, self.guild["id"]),
+            "session_id": "fake",
+            "deaf": False, "mute": False, "self_deaf": False, "self_mute": False,
+            "self_video": False, "suppress": False, "request_to_speak_timestamp": None,
+        })
+
+    def send(self, event):
+        kind, _, name = event.partition(":")
+        if kind == "slash":
+            self.send_slash(name)
+        elif kind == "prefix":
+            self.send_message(PREFIX_CONTENT.get(name, f".{name}"), event)
+        elif kind == "mention":
+            bot_user = self.fake.bot_user
+            self.send_message(f"<@{bot_user['id']}> ¿qué hora es?", event, mentions=[bot_user])
+        elif kind == "member_join":
+            self.send_member_join()
+        elif kind == "voice":
+            self.send_voice()
+        else:
+            raise ValueError(f"Tipo de evento desconocido: {event}")
+
+    async def run(self, drain):
+        events, weights = zip(*self.mix.items())
+        total = int(self.rate * self.duration)
+        start = time.perf_counter()
+        rss_start = rss_mb()
+
+        async def sample():
+            from utils import metrics
+            tick = 0
+            while True:
+                self.executor_queue_samples.append(metrics.executor.queued)
+                if tick % 4 == 0:
+                    self.rss_samples.append(rss_mb())
+                tick += 1
+                await asyncio.sleep(0.25)
+        sampler = asyncio.create_task(sample())
+
+        for i in range(total):
+            # Ritmo constante (open loop): no esperamos a que el bot responda
+            delay = start + i / self.rate - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self.send(random.choices(events, weights)[0])
+        send_elapsed = time.perf_counter() - start
+
+        # Esperamos a que terminen las respuestas pendientes (o se agote el drenaje)
+        deadline = time.perf_counter() + drain
+        last_count = -1
+        while time.perf_counter() < deadline:
+            await asyncio.sleep(1)
+            if len(self.last_response) == last_count:
+                break
+            last_count = len(self.last_response)
+
+        sampler.cancel()
+        # La última respuesta (followup, edición...) marca el fin de cada evento
+        for key, latency in list(self.last_response.items()):
+            self.done[self.sent[key][0]].append(latency)
+
+        return self.report(total, send_elapsed, time.perf_counter() - start, rss_start, rss_mb())
+
+    # --- INFORME ---
+
+    def report(self, total, send_elapsed, elapsed, rss_start, rss_end):
+        from utils import metrics
+        from utils import watchdog
+
+        def ms(value):
+            return None if value is None else round(value * 1000, 1)
+
+        responses = sum(len(v) for v in self.ack.values())
+        result = {
+            "events": total,
+            "send_rate": round(total / send_elapsed, 1),
+            "responses": responses,
+            "throughput": round(responses / elapsed, 1),
+            "per_event": {},
+            "bot_commands": {},
+            "bot_listeners": {},
+            "loop_lag_ms": {
+                "p50": ms(metrics.loop_lag.percentile(0.5)),
+                "p99": ms(metrics.loop_lag.percentile(0.99)),
+                "max": ms(max((max(s.recent) for s in metrics.loop_lag.series.values() if s.recent), default=None)),
+            },
+            "loop_stalls": watchdog.loop_stalls.total(),
+            "executor_queue": {"p99": percentile(self.executor_queue_samples, 0.99), "max": max(self.executor_queue_samples, default=0)},
+            "rss_mb": {"start": round(rss_start, 1), "end": round(rss_end, 1), "peak": round(max(self.rss_samples + [rss_end]), 1), "growth": round(rss_end - rss_start, 1)},
+        }
+
+        for event, count in sorted(self.sent_count.items()):
+            acks = self.ack.get(event, [])
+            done = self.done.get(event, [])
+            result["per_event"][event] = {
+                "sent": count,
+                "answered": len(acks),
+                "ack_p95": ms(percentile(acks, 0.95)),
+                "ack_p99": ms(percentile(acks, 0.99)),
+                "done_p95": ms(percentile(done, 0.95)),
+                "done_p99": ms(percentile(done, 0.99)),
+            }
+
+        # Lado del bot (utils.metrics): incluye prefix y listeners sin respuesta visible
+        for key, series in metrics.command_latency.series.items():
+            labels = dict(key)
+            name = f"{labels['kind']}:{labels['command']} ({labels['status']})"
+            result["bot_commands"][name] = {"count": series.count, "p95": ms(percentile(series.recent, 0.95)), "p99": ms(percentile(series.recent, 0.99))}
+        for key, series in metrics.listener_latency.series.items():
+            labels = dict(key)
+            result["bot_listeners"][labels["listener"]] = {"count": series.count, "p95": ms(percentile(series.recent, 0.95)), "p99": ms(percentile(series.recent, 0.99))}
+        return result
+
+
+def print_report(result):
+    print("\n" + "=" * 72)
+    print(f"Eventos enviados: {result['events']} ({result['send_rate']}/s) · Respuestas: {result['responses']} ({result['throughput']}/s)")
+    lag = result["loop_lag_ms"]
+    print(f"Lag del loop: p50 {lag['p50']}ms · p99 {lag['p99']}ms · máx {lag['max']}ms · bloqueos: {result['loop_stalls']}")
+    queue = result["executor_queue"]
+    print(f"Cola del executor: p99 {queue['p99']} · máx {queue['max']}")
+    rss = result["rss_mb"]
+    print(f"RSS: {rss['start']} -> {rss['end']} MB (pico {rss['peak']}, crecimiento {rss['growth']:+})")
+
+    print(f"\n{'Evento (extremo a extremo)':<28}{'env.':>6}{'resp.':>7}{'ack p95':>10}{'ack p99':>10}{'fin p95':>10}{'fin p99':>10}")
+    for event, row in result["per_event"].items():
+        print(f"{event:<28}{row['sent']:>6}{row['answered']:>7}" + "".join(f"{str(row[k]):>10}" for k in ("ack_p95", "ack_p99", "done_p95", "done_p99")))
+
+    print(f"\n{'Comando (lado del bot)':<44}{'n':>6}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, row in sorted(result["bot_commands"].items()):
+        print(f"{name:<44}{row['count']:>6}{str(row['p95']):>10}{str(row['p99']):>10}")
+
+    print(f"\n{'Listener':<44}{'n':>6}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, row in sorted(result["bot_listeners"].items()):
+        print(f"{name[:43]:<44}{row['count']:>6}{str(row['p95']):>10}{str(row['p99']):>10}")
+
+
+async def run(args):
+    # El bot usa rutas relativas (./cogs) y lee la config de entorno al importar
+    os.chdir(ROOT)
+    sys.path.insert(0, ROOT)
+    workdir = tempfile.mkdtemp(prefix="kkbot-load-")
+    os.environ.setdefault("SHARED_STORE_PATH", os.path.join(workdir, "shared.db"))
+    os.environ.setdefault("MODLOG_PATH", os.path.join(workdir, "moderation.db"))
+    os.environ.setdefault("METRICS_PORT", "0")
+
+    from loadtest.fake_discord import FakeDiscord
+    fake = FakeDiscord(guilds=args.guilds, members=args.members, shards=args.shards)
+    if args.shards > 1:
+        os.environ["SHARDED"] = "1" # Antes de importar main: decide la clase base del Bot
+    port = fake.start()
+    base = f"http://127.0.0.1:{port}"
+
+    # Redirigimos discord.py al servidor falso
+    import discord
+    import yarl
+    discord.http.Route.BASE = base + "/api/v10"
+    discord.gateway.DiscordWebSocket.DEFAULT_GATEWAY = yarl.URL(f"ws://127.0.0.1:{port}/")
+    discord.asset.Asset.BASE = base
+
+    import main
+    bot = main.Bot()
+    await bot.login("fake-token")
+    connect = asyncio.create_task(bot.connect(reconnect=False))
+    await asyncio.wait_for(bot.wait_until_ready(), timeout=30)
+    print(f"🤖 Bot listo contra {base} · {len(bot.guilds)} guild(s), {args.members} miembros, {bot.shard_count or 1} shard(s)")
+
+    test = LoadTest(fake, bot, parse_mix(args.mix), args.rate, args.duration)
+    print(f"🚀 {args.rate} eventos/s durante {args.duration}s...")
+    result = await test.run(args.drain)
+
+    await bot.close()
+    connect.cancel()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga del bot contra un Discord falso")
+    parser.add_argument("--rate", type=float, default=20, help="Eventos por segundo")
+    parser.add_argument("--duration", type=float, default=30, help="Segundos de envío")
+    parser.add_argument("--drain", type=float, default=15, help="Segundos máximos esperando respuestas al final")
+    parser.add_argument("--members", type=int, default=200, help="Miembros del guild sintético")
+    parser.add_argument("--guilds", type=int, default=1, help="Guilds sintéticos (se reparten entre shards)")
+    parser.add_argument("--shards", type=int, default=1, help="Shards que recomienda el gateway falso; >1 activa SHARDED=1")
+    parser.add_argument("--mix", help='Mezcla "tipo=peso,..." (ej: "slash:ping=5,mention=1")')
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--json", help="Guardar el resultado en este archivo")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    result = asyncio.run(run(args))
+    print_report(result)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == '__main__':
+    main()
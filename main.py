@@ -2,37 +2,140 @@ import discord
 from discord.ext import commands
 import os
 import asyncio
+import time
 from dotenv import load_dotenv
+from utils.lazy import IMPORT_TIMES, prewarm, import_report
+from utils.shared_store import SharedStore
+from utils import metrics
+from utils.logger import setup_logger, set_log_context
+from utils.watchdog import LoopWatchdog
 
 # Carga variables desde .env (Solo funciona en local, en el host ya están en el sistema)
 load_dotenv()
 
-class Bot(commands.Bot):
-    def __init__(self):
+# SHARDED=1 -> AutoShardedBot (lo activa launcher.py en cada proceso worker)
+SHARDED = os.getenv("SHARDED") == "1"
+BaseBot = commands.AutoShardedBot if SHARDED else commands.Bot
+
+class BotTree(metrics.InstrumentedTree):
+    async def interaction_check(self, interaction):
+        # Campos de contexto para todos los logs que genere este slash command
+        set_log_context(
+            guild_id=interaction.guild_id,
+            user_id=interaction.user.id,
+            command=interaction.command.qualified_name if interaction.command else None
+        )
+        return await super().interaction_check(interaction)
+
+class Bot(BaseBot):
+    def __init__(self, shard_ids=None, shard_count=None, worker_id=0):
+        options = {}
+        if SHARDED:
+            # None = discord.py pide a Discord el número recomendado de shards
+            options = {"shard_ids": shard_ids, "shard_count": shard_count}
+
         super().__init__(
             command_prefix=".",
             intents=discord.Intents.all(), # O ajusta según necesites
-            help_command=None
+            help_command=None,
+            tree_cls=BotTree,
+            **options
         )
+        self.worker_id = worker_id
+        self.store = SharedStore()
+        self._prewarm_started = False
+        self._metrics_runner = None
+        self.watchdog = None
+
+        # Tiempos de comandos prefix (.play, .skip...)
+        self.before_invoke(self._mark_command_start)
+        self.after_invoke(self._observe_command)
+
+    async def _mark_command_start(self, ctx):
+        set_log_context(guild_id=ctx.guild.id if ctx.guild else None, user_id=ctx.author.id, command=ctx.command.qualified_name)
+        ctx.command_started = time.perf_counter()
+
+    async def _observe_command(self, ctx):
+        status = "error" if ctx.command_failed else "ok"
+        metrics.command_latency.observe(time.perf_counter() - ctx.command_started, command=ctx.command.qualified_name, kind="prefix", status=status)
+
+    async def _run_event(self, coro, event_name, *args, **kwargs):
+        # Mide cada listener (incluidos los de los cogs) por su nombre real
+        start = time.perf_counter()
+        try:
+            await super()._run_event(coro, event_name, *args, **kwargs)
+        finally:
+            metrics.listener_latency.observe(time.perf_counter() - start, event=event_name, listener=coro.__qualname__)
+
+    async def on_app_command_completion(self, interaction, command):
+        metrics.observe_interaction(interaction, "ok")
 
     async def setup_hook(self):
+        # Executor instrumentado: run_in_executor(None, ...) y asyncio.to_thread lo usan
+        self.loop.set_default_executor(metrics.executor)
+        self.loop.create_task(metrics.monitor_loop_lag())
+
+        # Watchdog de bloqueos del loop (WATCHDOG_THRESHOLD_MS=0 lo desactiva)
+        threshold_ms = int(os.getenv("WATCHDOG_THRESHOLD_MS", "250"))
+        if threshold_ms:
+            self.watchdog = LoopWatchdog(threshold=threshold_ms / 1000)
+            self.watchdog.start(self.loop)
+
+        # Endpoint Prometheus local, opcional: METRICS_PORT=9100 lo activa (cada worker usa puerto + id)
+        port = int(os.getenv("METRICS_PORT", "0"))
+        if port:
+            self._metrics_runner = await metrics.start_http_server(os.getenv("METRICS_HOST", "127.0.0.1"), port + self.worker_id)
+
+        # Almacén compartido entre procesos (memoria IA, búsquedas, totales)
+        await self.store.open()
+
         # Carga extensiones de la carpeta cogs
         for filename in os.listdir('./cogs'):
             if filename.endswith('.py'):
                 extension_name = f'cogs.{filename[:-3]}'
                 try:
+                    start = time.perf_counter()
                     await self.load_extension(extension_name)
+                    IMPORT_TIMES[extension_name] = time.perf_counter() - start
                 except Exception as e:
                     print(f'❌ Error cargando {extension_name}: {e}')
 
-        await self.tree.sync()
-        print("🌲 Slash commands sincronizados")
+        # Reporte de tiempos de arranque (cogs + imports pesados ya resueltos)
+        print(f"⏱️ Tiempos de import:\n{import_report()}")
+
+        # Los comandos son globales: con varios procesos basta con que uno sincronice
+        if self.worker_id == 0:
+            await self.tree.sync()
+            print("🌲 Slash commands sincronizados")
 
     async def on_ready(self):
-        print(f'✅ Logueado como {self.user}')
+        if SHARDED:
+            print(f'✅ Logueado como {self.user} (worker {self.worker_id}, shards {self.shard_ids})')
+        else:
+            print(f'✅ Logueado como {self.user}')
+
+        # Pre-calentamiento opcional de imports pesados (yt_dlp, ollama, Pillow...)
+        # on_ready se repite en cada reconexión, solo lo lanzamos una vez
+        if os.getenv("PREWARM_IMPORTS") == "1" and not self._prewarm_started:
+            self._prewarm_started = True
+            asyncio.create_task(self._prewarm())
+
+    async def _prewarm(self):
+        await prewarm()
+        print(f"🔥 Pre-calentamiento completado:\n{import_report()}")
+
+    async def close(self):
+        await super().close()
+        await self.store.close()
+        if self.watchdog:
+            self.watchdog.stop()
+        if self._metrics_runner:
+            await self._metrics_runner.cleanup()
 
-async def main():
-    bot = Bot()
+async def main(shard_ids=None, shard_count=None, worker_id=0):
+    # Con el launcher hay varios procesos: un archivo de log por worker
+    setup_logger(worker_id=worker_id if SHARDED else None)
+    bot = Bot(shard_ids=shard_ids, shard_count=shard_count, worker_id=worker_id)
     async with bot:
         await bot.start(os.getenv("DISCORD_TOKEN"))
 
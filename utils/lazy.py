@@ -0,0 +1,114 @@
+import asyncio
+import importlib
+import logging
+import threading
+import time
+
+logger = logging.getLogger("bot")
+
+# Registro de tiempos de importación: {nombre: segundos}
+IMPORT_TIMES = {}
+
+# Módulos/objetos perezosos registrados (para el pre-calentamiento)
+_REGISTRY = []
+
+
+class LazyModule:
+    """
+    Proxy de un módulo que solo se importa la primera vez que se usa.
+    Ej: yt_dlp = lazy_import("yt_dlp") -> el import real ocurre en yt_dlp.YoutubeDL
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._module is None:
+            # Lock porque el primer uso puede ocurrir en un hilo del executor
+            with self._lock:
+                if self._module is None:
+                    start = time.perf_counter()
+                    module = importlib.import_module(self._name)
+                    IMPORT_TIMES[self._name] = time.perf_counter() - start
+                    logger.info(f"📦 Import perezoso: {self._name} ({IMPORT_TIMES[self._name] * 1000:.0f}ms)")
+                    self._module = module
+        return self._module
+
+    @property
+    def loaded(self):
+        return self._module is not None
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = "cargado" if self.loaded else "pendiente"
+        return f"<LazyModule {self._name} ({state})>"
+
+
+class LazyValue:
+    """Objeto caro (ej. YoutubeDL) que se construye en el primer .get()."""
+
+    def __init__(self, name, factory):
+        self._name = name
+        self._factory = factory
+        self._value = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._value is None:
+            with self._lock:
+                if self._value is None:
+                    start = time.perf_counter()
+                    value = self._factory()
+                    IMPORT_TIMES[self._name] = time.perf_counter() - start
+                    self._value = value
+        return self._value
+
+    get = _load
+
+    @property
+    def loaded(self):
+        return self._value is not None
+
+
+def lazy_import(name):
+    """Devuelve un LazyModule registrado para el pre-calentamiento."""
+    module = LazyModule(name)
+    _REGISTRY.append(module)
+    return module
+
+
+def lazy_value(name, factory):
+    """Devuelve un LazyValue registrado para el pre-calentamiento."""
+    value = LazyValue(name, factory)
+    _REGISTRY.append(value)
+    return value
+
+
+async def prewarm():
+    """
+    Carga en segundo plano (en un hilo) todo lo registrado que siga pendiente.
+    Pensado para lanzarse tras on_ready, así el primer /play no paga el import.
+    """
+    for item in list(_REGISTRY):
+        if item.loaded:
+            continue
+        try:
+            await asyncio.to_thread(item._load)
+        except Exception as e:
+            # Dependencia opcional no instalada: se avisará en el primer uso real
+            logger.warning(f"⚠️ Pre-calentamiento falló para {item._name}: {e}")
+
+
+def import_report():
+    """Texto con los tiempos de import, de más lento a más rápido."""
+    if not IMPORT_TIMES:
+        return "Sin imports registrados."
+    lines = [f"{name:<30} {secs * 1000:>8.1f}ms" for name, secs in sorted(IMPORT_TIMES.items(), key=lambda kv: kv[1], reverse=True)]
+    pending = [item._name for item in _REGISTRY if not item.loaded]
+    if pending:
+        lines.append(f"Pendientes (perezosos): {', '.join(pending)}")
+    return "\n".join(lines)
@@ -1,43 +1,210 @@
+import atexit
+import contextvars
+import copy
+import json
 import logging
 import logging.handlers
 import os
+import queue
 import sys
+import time
+from utils import metrics
+
+# Contexto de la interacción actual (guild, usuario, comando...). Al ser un
+# ContextVar, cada tarea de asyncio ve el suyo aunque se intercalen.
+log_context = contextvars.ContextVar("log_context", default={})
+
+dropped_logs = metrics.register(metrics.Counter("bot_log_dropped_total", "Mensajes de log descartados (cola llena o muestreo)"))
+
+_listener = None
+
+
+def set_log_context(**fields):
+    """Añade campos (guild_id, user_id, command...) a todos los logs de esta tarea."""
+    log_context.set({**log_context.get(), **fields})
+
+
+class ContextFilter(logging.Filter):
+    """Copia el contexto al record en el hilo que loguea (antes de pasar a la cola)."""
+
+    def filter(self, record):
+        record.context = log_context.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Para mensajes muy repetidos: deja pasar `burst` por ventana de `window`
+    segundos por cada línea de código que loguea y descarta (contando) el resto.
+    La clave es el sitio de la llamada y no el texto: los mensajes del bot son
+    f-strings y casi nunca se repiten tal cual.
+    WARNING o superior nunca se muestrea.
+    """
+
+    def __init__(self, burst=20, window=10.0):
+        super().__init__()
+        self.burst = burst
+        self.window = window
+        self.windows = {} # {(logger, archivo, línea): [inicio_ventana, cuenta]}
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+
+        key = (record.name, record.pathname, record.lineno)
+        now = time.monotonic()
+        state = self.windows.get(key)
+        if state is None or now - state[0] > self.window:
+            # Limitar el tamaño: si hay demasiados sitios, empezar de cero
+            if len(self.windows) > 5000:
+                self.windows.clear()
+            self.windows[key] = [now, 1]
+            return True
+
+        state[1] += 1
+        if state[1] <= self.burst:
+            return True
+        dropped_logs.inc(reason="sampled")
+        return False
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler que nunca bloquea: si la cola está llena, descarta y cuenta."""
+
+    def prepare(self, record):
+        """
+        El prepare() estándar mete la traza dentro del mensaje y borra exc_info
+        (piensa en colas entre procesos). Nuestra cola es en memoria: fijamos el
+        mensaje y dejamos exc_info para que el formatter lo ponga en su campo.
+        """
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            dropped_logs.inc(reason="queue_full")
+
+
+class LogListener(logging.handlers.QueueListener):
+    """QueueListener que al parar espera hueco en la cola en vez de fallar si está llena."""
+
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+
+class JsonFormatter(logging.Formatter):
+    """Una línea JSON por mensaje, con los campos de contexto incluidos."""
+
+    def format(self, record):
+        data = {
+            "time": self.formatTime(record, '%Y-%m-%d %H:%M:%S'),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "thread": record.threadName,
+        }
+        data.update(getattr(record, "context", {}))
+        if record.exc_info:
+            data["exception"] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Formato clásico [HORA] [NIVEL] nombre: mensaje, más el contexto si existe."""
+
+    def format(self, record):
+        text = super().format(record)
+        context = getattr(record, "context", None)
+        if context:
+            text += " | " + " ".join(f"{k}={v}" for k, v in context.items())
+        return text
+
+
+def setup_logger(json_output=None, queue_size=None, worker_id=None):
+    """
+    Configura el logger "bot" con un pipeline no bloqueante:
+    logger -> DroppingQueueHandler (cola acotada) -> hilo QueueListener -> consola + archivo.
+
+    worker_id: con launcher.py cada proceso escribe en logs/bot-<id>.log; rotar
+    un mismo archivo desde varios procesos pierde o pisa líneas.
+
+    Variables de entorno: LOG_JSON=1, LOG_QUEUE_SIZE, LOG_SAMPLE_BURST, LOG_SAMPLE_WINDOW.
+    """
+    global _listener
+
+    logger = logging.getLogger("bot")
+    if _listener is not None:
+        return logger
+
+    if json_output is None:
+        json_output = os.getenv("LOG_JSON") == "1"
+    if queue_size is None:
+        queue_size = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
 
-def setup_logger():
     # 1. Crear carpeta de logs si no existe
     if not os.path.exists("logs"):
         os.makedirs("logs")
 
-    # 2. Obtener el logger principal
-    logger = logging.getLogger("bot")
     logger.setLevel(logging.INFO)
 
-    # 3. Definir el formato: [HORA] [NIVEL] MENSAJE
-    formatter = logging.Formatter(
-        '[{asctime}] [{levelname:<8}] {name}: {message}',
-        style='{',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
+    # 2. Definir el formato: [HORA] [NIVEL] MENSAJE (o JSON)
+    if json_output:
+        formatter = JsonFormatter()
+    else:
+        formatter = TextFormatter(
+            '[{asctime}] [{levelname:<8}] {name}: {message}',
+            style='{',
+            datefmt='%Y-%m-%d %H:%M:%S'
+        )
 
-    # 4. Handler de Consola (Para verlo en Bloom Host)
+    # 3. Handler de Consola (Para verlo en Bloom Host)
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
 
-    # 5. Handler de Archivo (Guarda historial)
+    # 4. Handler de Archivo (Guarda historial)
     # RotatingFileHandler: Si el archivo llega a 5MB, crea uno nuevo y guarda 1 backup.
     # Así no llenas el disco de Bloom Host.
+    filename = "logs/bot.log" if worker_id is None else f"logs/bot-{worker_id}.log"
     file_handler = logging.handlers.RotatingFileHandler(
-        filename="logs/bot.log",
+        filename=filename,
         encoding="utf-8",
         maxBytes=5 * 1024 * 1024,  # 5 MB
         backupCount=1
     )
     file_handler.setFormatter(formatter)
-    logger.addHandler(file_handler)
+
+    # 5. Los handlers con I/O solo los toca el hilo del listener, nunca el event loop
+    log_queue = queue.Queue(maxsize=queue_size)
+    queue_handler = DroppingQueueHandler(log_queue)
+    queue_handler.addFilter(ContextFilter())
+    queue_handler.addFilter(SamplingFilter(
+        burst=int(os.getenv("LOG_SAMPLE_BURST", "20")),
+        window=float(os.getenv("LOG_SAMPLE_WINDOW", "10"))
+    ))
+    logger.addHandler(queue_handler)
+
+    _listener = LogListener(log_queue, console_handler, file_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logger)
+
+    metrics.register(metrics.Gauge("bot_log_queue_depth", "Mensajes de log esperando al hilo escritor", func=log_queue.qsize))
 
     # Opcional: Limpiar logs ruidosos de librerías externas
+    # discord.py también pasa por la cola (solo WARNING o superior)
     logging.getLogger("discord").setLevel(logging.WARNING)
     logging.getLogger("discord.http").setLevel(logging.WARNING)
+    logging.getLogger("discord").addHandler(queue_handler)
+
+    return logger
+
 
-    return logger
\ No newline at end of file
+def stop_logger():
+    """Vacía la cola y detiene el hilo escritor (se llama al salir)."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,236 @@
+import asyncio
+import bisect
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from discord import app_commands
+from aiohttp import web
+
+logger = logging.getLogger("bot")
+
+# Buckets en segundos: desde 5ms (comandos triviales) hasta 30s (yt-dlp/Ollama lentos)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def _label_str(labels):
+    if not labels:
+        return ""
+    inner = ",".join(f'{k}="{str(v).replace(chr(34), chr(39))}"' for k, v in labels)
+    return "{" + inner + "}"
+
+
+class Counter:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self.values = {}
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def total(self, **labels):
+        """Suma de todas las series que contienen esas etiquetas."""
+        wanted = set(labels.items())
+        return sum(v for k, v in self.values.items() if wanted <= set(k))
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for key, value in self.values.items():
+            lines.append(f"{self.name}{_label_str(key)} {value}")
+        return lines
+
+
+class Gauge:
+    """Valor instantáneo. Si se pasa `func`, se calcula al leerlo."""
+
+    def __init__(self, name, help_text, func=None):
+        self.name = name
+        self.help = help_text
+        self.func = func
+        self.value = 0
+
+    def set(self, value):
+        self.value = value
+
+    def get(self):
+        return self.func() if self.func else self.value
+
+    def render(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge", f"{self.name} {self.get()}"]
+
+
+class _Series:
+    def __init__(self, buckets):
+        self.counts = [0] * (len(buckets) + 1) # El último es +Inf
+        self.sum = 0.0
+        self.count = 0
+        # Últimas muestras para calcular p95/p99 exactos en /botinfo
+        self.recent = deque(maxlen=1024)
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = buckets
+        self.series = {}
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        series = self.series.get(key)
+        if series is None:
+            series = self.series[key] = _Series(self.buckets)
+        series.counts[bisect.bisect_left(self.buckets, value)] += 1
+        series.sum += value
+        series.count += 1
+        series.recent.append(value)
+
+    def percentile(self, q, **labels):
+        """Percentil (0-1) de las muestras recientes de las series que coinciden."""
+        wanted = set(labels.items())
+        samples = []
+        for key, series in self.series.items():
+            if wanted <= set(key):
+                samples.extend(series.recent)
+        if not samples:
+            return None
+        samples.sort()
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, series in self.series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series.counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_label_str(key + (('le', bound),))} {cumulative}")
+            lines.append(f"{self.name}_sum{_label_str(key)} {series.sum}")
+            lines.append(f"{self.name}_count{_label_str(key)} {series.count}")
+        return lines
+
+
+class InstrumentedExecutor(ThreadPoolExecutor):
+    """ThreadPoolExecutor que cuenta tareas en cola y en ejecución."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self.queued = 0
+        self.active = 0
+
+    def submit(self, fn, /, *args, **kwargs):
+        with self._stats_lock:
+            self.queued += 1
+
+        def wrapper():
+            with self._stats_lock:
+                self.queued -= 1
+                self.active += 1
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._stats_lock:
+                    self.active -= 1
+
+        def on_done(future):
+            # Cancelada antes de arrancar: el wrapper nunca correrá
+            if future.cancelled():
+                with self._stats_lock:
+                    self.queued -= 1
+
+        try:
+            future = super().submit(wrapper)
+        except RuntimeError: # Executor ya cerrado
+            with self._stats_lock:
+                self.queued -= 1
+            raise
+        future.add_done_callback(on_done)
+        return future
+
+
+# --- REGISTRO GLOBAL ---
+executor = InstrumentedExecutor(max_workers=int(os.getenv("EXECUTOR_WORKERS", "0")) or None, thread_name_prefix="bot-executor")
+
+command_latency = Histogram("bot_command_latency_seconds", "Duración de comandos (slash y prefix)")
+listener_latency = Histogram("bot_listener_latency_seconds", "Duración de listeners de eventos")
+loop_lag = Histogram("bot_event_loop_lag_seconds", "Retraso del event loop", buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5))
+cache_requests = Counter("bot_cache_requests_total", "Consultas a cachés por resultado (hit/miss)")
+executor_queue = Gauge("bot_executor_queue_depth", "Tareas esperando en el executor por defecto", func=lambda: executor.queued)
+executor_active = Gauge("bot_executor_active_threads", "Hilos del executor ocupados", func=lambda: executor.active)
+executor_max = Gauge("bot_executor_max_workers", "Tamaño del executor por defecto", func=lambda: executor._max_workers)
+
+REGISTRY = [command_latency, listener_latency, loop_lag, cache_requests, executor_queue, executor_active, executor_max]
+
+
+def register(metric):
+    """Permite que otros módulos añadan sus métricas al endpoint."""
+    REGISTRY.append(metric)
+    return metric
+
+
+def record_cache(cache, hit):
+    cache_requests.inc(cache=cache, result="hit" if hit else "miss")
+
+
+def cache_hit_rate(cache):
+    hits = cache_requests.total(cache=cache, result="hit")
+    total = hits + cache_requests.total(cache=cache, result="miss")
+    return hits / total if total else None
+
+
+def render():
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+class InstrumentedTree(app_commands.CommandTree):
+    """CommandTree que marca el inicio de cada interacción para medir su latencia."""
+
+    async def interaction_check(self, interaction):
+        interaction.extras["started"] = time.perf_counter()
+        return True
+
+
+def observe_interaction(interaction, status):
+    """Registra la duración de un slash command (llamado al completar o fallar)."""
+    started = interaction.extras.get("started")
+    if started is None or interaction.command is None:
+        return
+    command_latency.observe(time.perf_counter() - started, command=interaction.command.qualified_name, kind="slash", status=status)
+
+
+async def monitor_loop_lag(interval=0.5):
+    """Mide cuánto tarda el loop en despertar respecto a lo pedido."""
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        loop_lag.observe(max(0.0, time.perf_counter() - start - interval))
+
+
+async def start_http_server(host, port):
+    """
+    Endpoint /metrics en formato Prometheus (solo local por defecto).
+    Si el puerto está ocupado devuelve None: la telemetría nunca tumba al bot.
+    """
+    async def handle(request):
+        return web.Response(text=render(), content_type="text/plain", charset="utf-8")
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    try:
+        await site.start()
+    except OSError as e:
+        logger.warning(f"⚠️ No se pudo abrir el endpoint de métricas en {host}:{port} ({e}); sigo sin él.")
+        await runner.cleanup()
+        return None
+    logger.info(f"📈 Métricas en http://{host}:{port}/metrics")
+    return runner
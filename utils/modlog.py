@@ -0,0 +1,153 @@
+import asyncio
+import json
+import logging
+import os
+import time
+import aiosqlite
+
+logger = logging.getLogger("bot")
+
+DEFAULT_PATH = os.getenv("MODLOG_PATH", "data/moderation.db")
+FLUSH_INTERVAL = 1.0 # Segundos máximos que un caso espera en memoria
+FLUSH_BATCH = 200 # Si se acumulan tantos, se escriben sin esperar
+
+
+class CaseStore:
+    """
+    Registro persistente de acciones de moderación (SQLite).
+
+    - Las escrituras desde los comandos solo encolan el caso; una tarea en
+      segundo plano las agrupa en una sola transacción.
+    - Las consultas paginan por id (keyset), así la página 1000 cuesta lo
+      mismo que la 1 aunque haya millones de casos.
+    """
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self.db = None
+        self.pending = []
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task = None
+
+    async def open(self):
+        folder = os.path.dirname(self.path)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder)
+
+        self.db = await aiosqlite.connect(self.path)
+        self.db.row_factory = aiosqlite.Row
+        await self.db.execute("PRAGMA journal_mode=WAL")
+        await self.db.execute("PRAGMA synchronous=NORMAL")
+        await self.db.execute("PRAGMA busy_timeout=5000")
+        await self.db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS cases (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                guild_id INTEGER NOT NULL,
+                action TEXT NOT NULL,
+                target_id INTEGER,
+                moderator_id INTEGER NOT NULL,
+                reason TEXT,
+                created_at REAL NOT NULL,
+                extra TEXT
+            );
+            -- El id crece con el tiempo: ordenar por id = ordenar por fecha
+            CREATE INDEX IF NOT EXISTS idx_cases_target ON cases (guild_id, target_id, id);
+            CREATE INDEX IF NOT EXISTS idx_cases_moderator ON cases (guild_id, moderator_id, id);
+            CREATE INDEX IF NOT EXISTS idx_cases_time ON cases (guild_id, created_at);
+            """
+        )
+        await self.db.commit()
+        self._task = asyncio.create_task(self._flush_loop())
+        return self
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            # Esperamos a que termine de verdad: si estaba a mitad de un flush,
+            # su lote vuelve a `pending` y lo escribe el flush final
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.db:
+            # El hilo de aiosqlite pudo ejecutar el INSERT cancelado sin commit:
+            # lo descartamos para no duplicar el lote devuelto a `pending`
+            await self.db.rollback()
+            await self.flush()
+            await self.db.close()
+            self.db = None
+
+    def record(self, guild_id, action, moderator_id, target_id=None, reason=None, **extra):
+        """Encola un caso. No hace I/O: se puede llamar desde cualquier comando."""
+        self.pending.append((guild_id, action, target_id, moderator_id, reason, time.time(), json.dumps(extra) if extra else None))
+        if len(self.pending) >= FLUSH_BATCH:
+            self._wakeup.set()
+
+    async def flush(self):
+        async with self._flush_lock:
+            if not self.pending:
+                return
+            batch, self.pending = self.pending, []
+            try:
+                await self.db.executemany(
+                    "INSERT INTO cases (guild_id, action, target_id, moderator_id, reason, created_at, extra) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    batch
+                )
+                await self.db.commit()
+            except BaseException:
+                # Se reintentará en el siguiente ciclo (p. ej. base de datos bloqueada).
+                # BaseException: una cancelación a mitad tampoco debe perder el lote.
+                self.pending = batch + self.pending
+                raise
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=FLUSH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Error guardando casos de moderación: {e}")
+
+    async def query(self, guild_id, target_id=None, moderator_id=None, since=None, before_id=None, limit=10):
+        """
+        Casos de un servidor, del más reciente al más antiguo.
+        before_id: id del último caso de la página anterior (cursor).
+        """
+        # Lo encolado también debe aparecer en la consulta
+        await self.flush()
+
+        sql = "SELECT * FROM cases WHERE guild_id = ?"
+        params = [guild_id]
+        if target_id is not None:
+            sql += " AND target_id = ?"
+            params.append(target_id)
+        if moderator_id is not None:
+            sql += " AND moderator_id = ?"
+            params.append(moderator_id)
+        if since is not None:
+            # Traducimos la fecha a un id con una sola búsqueda en idx_cases_time,
+            # así el recorrido por idx_cases_target/moderator se corta ahí
+            async with self.db.execute(
+                "SELECT id FROM cases WHERE guild_id = ? AND created_at >= ? ORDER BY created_at LIMIT 1",
+                (guild_id, since)
+            ) as cursor:
+                row = await cursor.fetchone()
+            if row is None:
+                return []
+            sql += " AND id >= ? AND created_at >= ?"
+            params.extend([row["id"], since])
+        if before_id is not None:
+            sql += " AND id < ?"
+            params.append(before_id)
+        sql += " ORDER BY id DESC LIMIT ?"
+        params.append(limit)
+
+        async with self.db.execute(sql, params) as cursor:
+            return await cursor.fetchall()
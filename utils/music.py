@@ -0,0 +1,344 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+import discord
+from utils.lazy import lazy_import, lazy_value
+from utils import metrics
+
+logger = logging.getLogger("bot")
+
+# Imports pesados: se cargan en el primer uso (o en el pre-calentamiento)
+yt_dlp = lazy_import("yt_dlp")
+spotipy = lazy_import("spotipy")
+spotipy_oauth2 = lazy_import("spotipy.oauth2")
+
+# --- CONFIGURACIÓN TÉCNICA ---
+YTDL_OPTIONS = {
+    'format': 'bestaudio/best',
+    'outtmpl': '%(extractor)s-%(id)s-%(title)s.%(ext)s',
+    'restrictfilenames': True,
+    'noplaylist': True,
+    'nocheckcertificate': True,
+    'ignoreerrors': False,
+    'logtostderr': False,
+    'quiet': True,
+    'no_warnings': True,
+    'default_search': 'auto',
+    'source_address': '0.0.0.0',
+}
+
+FFMPEG_OPTIONS = {
+    'before_options': '-reconnect 1 -reconnect_streamed 1 -reconnect_delay_max 5',
+    'options': '-vn',
+}
+
+# Índice de búsquedas compartido entre shards: "texto buscado" -> [url, título]
+SEARCH_INDEX_NS = "music_search"
+SEARCH_INDEX_TTL = 6 * 3600 # Las URLs de YouTube son estables, 6h es seguro
+
+# Las URLs de audio que devuelve yt-dlp caducan: las guardamos poco tiempo
+STREAM_CACHE_TTL = 20 * 60
+STREAM_CACHE_MAX = 500
+
+# Instancia única de YoutubeDL, construida la primera vez que se necesita
+ytdl = lazy_value("YoutubeDL", lambda: yt_dlp.YoutubeDL(YTDL_OPTIONS))
+
+
+def search_key(busqueda):
+    """
+    Clave del índice de búsquedas. Solo el texto libre se normaliza: los IDs
+    de YouTube distinguen mayúsculas, así que una URL se guarda tal cual.
+    """
+    busqueda = busqueda.strip()
+    if busqueda.startswith(("http://", "https://")):
+        return busqueda
+    return " ".join(busqueda.lower().split())
+
+
+music_ops = metrics.register(metrics.Histogram("bot_music_operation_seconds", "Duración de operaciones de música (búsqueda, extracción, conexión)"))
+
+
+class GuildPlayer:
+    """
+    Estado de reproducción de un servidor. Todas las operaciones pasan por
+    `self.lock`, incluido el avance automático que dispara el callback `after`
+    (que corre en el hilo de voz), así comandos y fin de canción no se pisan.
+    """
+
+    def __init__(self, service, guild):
+        self.service = service
+        self.guild = guild
+        self.queue = deque() # La lista de canciones en espera: (url, título)
+        self.current_track = None # La canción sonando ahora
+        self.volume = 0.5 # Volumen por defecto (50%)
+        self.lock = asyncio.Lock()
+
+    @property
+    def voice_client(self):
+        return self.guild.voice_client
+
+    def is_active(self):
+        vc = self.voice_client
+        return bool(vc and (vc.is_playing() or vc.is_paused()))
+
+    async def connect(self, channel):
+        """Conecta (o mueve) el bot al canal de voz indicado."""
+        async with self.lock:
+            vc = self.voice_client
+            if vc is None:
+                start = time.perf_counter()
+                vc = await channel.connect()
+                music_ops.observe(time.perf_counter() - start, op="connect")
+            elif vc.channel != channel and not self.is_active():
+                await vc.move_to(channel)
+            return vc
+
+    async def enqueue(self, url, title):
+        """Añade a la cola. Devuelve True si empezó a sonar ya."""
+        async with self.lock:
+            self.queue.append((url, title))
+            if self.is_active():
+                # Ya suena algo: adelantamos la extracción del audio
+                self.service.prefetch(url)
+                return False
+            await self._play_next()
+            return True
+
+    async def _play_next(self):
+        """Arranca la siguiente canción. Llamar siempre con el lock tomado."""
+        vc = self.voice_client
+        while self.queue and vc and vc.is_connected():
+            url, title = self.queue.popleft()
+            self.current_track = title
+            try:
+                stream_url = await self.service.get_stream_url(url)
+                source = discord.FFmpegPCMAudio(stream_url, **FFMPEG_OPTIONS)
+                source = discord.PCMVolumeTransformer(source, volume=self.volume)
+                # El 'after' corre en el hilo de voz: volvemos al loop para avanzar
+                vc.play(source, after=self._after)
+                if self.queue:
+                    self.service.prefetch(self.queue[0][0])
+                return
+            except Exception as e:
+                logger.error(f"Error reproduciendo {title}: {e}") # Si falla, intenta la siguiente
+
+        # Se acabó la cola
+        self.current_track = None
+
+    def _after(self, error):
+        if error:
+            logger.error(f"Error en el reproductor de {self.guild.name}: {error}")
+        asyncio.run_coroutine_threadsafe(self._advance(), self.service.bot.loop)
+
+    async def _advance(self):
+        async with self.lock:
+            if not self.is_active():
+                await self._play_next()
+
+    async def skip(self):
+        async with self.lock:
+            vc = self.voice_client
+            if not vc or not vc.is_playing():
+                return False
+            vc.stop() # Esto dispara el 'after', que avanza cuando soltemos el lock
+            return True
+
+    async def pause(self):
+        async with self.lock:
+            vc = self.voice_client
+            if vc and vc.is_playing():
+                vc.pause()
+                return True
+            return False
+
+    async def resume(self):
+        async with self.lock:
+            vc = self.voice_client
+            if vc and vc.is_paused():
+                vc.resume()
+                return True
+            return False
+
+    async def set_volume(self, nivel):
+        """nivel 0-100. Devuelve False si no hay nada sonando."""
+        async with self.lock:
+            vc = self.voice_client
+            if not vc or not vc.source:
+                return False
+            self.volume = max(0, min(100, nivel)) / 100
+            vc.source.volume = self.volume # Se guarda también para la siguiente canción
+            return True
+
+    async def stop(self):
+        """Limpia la cola y desconecta. Devuelve False si no estaba conectado."""
+        async with self.lock:
+            self.queue.clear()
+            self.current_track = None
+            vc = self.voice_client
+            if not vc:
+                return False
+            await vc.disconnect()
+            return True
+
+
+class MusicService:
+    """
+    Capa común de música: búsqueda (con índice compartido), Spotify,
+    caché/prefetch de audio y un GuildPlayer por servidor. Los comandos
+    slash, los de prefijo y el puente de la IA llaman todos aquí.
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.players = {} # {guild_id: GuildPlayer}
+        self.stream_cache = {} # {url: (stream_url, caduca)}
+        self._prefetching = {}
+
+        # Configuración Spotify (Opcional). El cliente se crea en el primer uso.
+        self._sp = None
+        self.spotify_enabled = False
+        client_id = os.getenv("SPOTIFY_CLIENT_ID")
+        client_secret = os.getenv("SPOTIFY_CLIENT_SECRET")
+        if client_id and client_secret and client_id != "tu_id_aqui":
+            self.spotify_enabled = True
+            print("✅ Spotify configurado (se conectará al primer uso).")
+        else:
+            print("ℹ️ Modo YouTube Puro (Sin Spotify).")
+
+    def get_player(self, guild):
+        """Obtiene o crea el reproductor de un servidor"""
+        player = self.players.get(guild.id)
+        if player is None:
+            player = self.players[guild.id] = GuildPlayer(self, guild)
+        return player
+
+    # --- SPOTIFY ---
+
+    @property
+    def sp(self):
+        """Cliente de Spotify perezoso: importa spotipy solo si hace falta"""
+        if self._sp is None and self.spotify_enabled:
+            try:
+                auth = spotipy_oauth2.SpotifyClientCredentials(
+                    client_id=os.getenv("SPOTIFY_CLIENT_ID"),
+                    client_secret=os.getenv("SPOTIFY_CLIENT_SECRET")
+                )
+                self._sp = spotipy.Spotify(auth_manager=auth)
+                print("✅ Spotify conectado.")
+            except:
+                print("⚠️ Error en credenciales Spotify.")
+                self.spotify_enabled = False
+        return self._sp
+
+    async def get_spotify_track_info(self, url):
+        """Convierte Link de Spotify -> Texto de búsqueda"""
+        if not self.spotify_enabled: return None
+        try:
+            # self.sp se resuelve dentro del hilo: el import de spotipy no bloquea el loop
+            track = await asyncio.to_thread(lambda: self.sp.track(url))
+            return f"{track['artists'][0]['name']} - {track['name']} audio"
+        except:
+            return None
+
+    # --- BÚSQUEDA Y AUDIO ---
+
+    async def search_track(self, busqueda):
+        """
+        Resuelve una búsqueda a (url, título). Usa el índice compartido entre
+        shards (SharedStore) para no repetir la consulta a yt-dlp.
+        """
+        key = search_key(busqueda)
+        cached = await self.bot.store.get(SEARCH_INDEX_NS, key)
+        metrics.record_cache("music_search", cached is not None)
+        if cached:
+            return cached[0], cached[1]
+
+        start = time.perf_counter()
+        data = await asyncio.to_thread(lambda: ytdl.get().extract_info(busqueda, download=False))
+        music_ops.observe(time.perf_counter() - start, op="search")
+
+        if 'entries' in data: data = data['entries'][0]
+
+        title = data.get('title', 'Canción desconocida')
+        url = data.get('webpage_url', busqueda) # URL limpia para guardar en cola
+
+        # Aprovechamos la extracción: la URL de audio ya viene en la respuesta
+        if data.get('url'):
+            self._cache_stream(url, data['url'])
+
+        await self.bot.store.set(SEARCH_INDEX_NS, key, [url, title], ttl=SEARCH_INDEX_TTL)
+        return url, title
+
+    def _cache_stream(self, url, stream_url):
+        if len(self.stream_cache) >= STREAM_CACHE_MAX:
+            now = time.monotonic()
+            self.stream_cache = {k: v for k, v in self.stream_cache.items() if v[1] > now}
+        self.stream_cache[url] = (stream_url, time.monotonic() + STREAM_CACHE_TTL)
+
+    async def get_stream_url(self, url):
+        """URL de audio para FFmpeg: caché -> prefetch en curso -> extracción."""
+        cached = self.stream_cache.get(url)
+        hit = cached is not None and cached[1] > time.monotonic()
+        metrics.record_cache("music_stream", hit)
+        if hit:
+            return cached[0]
+
+        pending = self._prefetching.get(url)
+        if pending:
+            try:
+                # shield: si cancelan a quien espera, el prefetch sigue para los demás
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if not pending.cancelled():
+                    raise # Nos cancelaron a nosotros, no al prefetch
+            except Exception:
+                pass # El prefetch falló: probamos con una extracción nueva
+
+        return await self._extract_stream(url)
+
+    async def _extract_stream(self, url):
+        start = time.perf_counter()
+        data = await asyncio.to_thread(lambda: ytdl.get().extract_info(url, download=False))
+        music_ops.observe(time.perf_counter() - start, op="extract")
+
+        if 'entries' in data: data = data['entries'][0]
+        self._cache_stream(url, data['url'])
+        return data['url']
+
+    def prefetch(self, url):
+        """Extrae en segundo plano el audio de la próxima canción."""
+        cached = self.stream_cache.get(url)
+        if (cached and cached[1] > time.monotonic()) or url in self._prefetching:
+            return
+
+        async def run():
+            try:
+                return await self._extract_stream(url)
+            finally:
+                self._prefetching.pop(url, None)
+
+        task = asyncio.ensure_future(run())
+        # Si el prefetch falla, lo reintentará la reproducción normal
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        self._prefetching[url] = task
+
+    async def resolve(self, busqueda):
+        """
+        Texto del usuario -> (url, título). Devuelve (None, mensaje_de_error)
+        si no se puede resolver.
+        """
+        if "spotify.com" in busqueda:
+            if not self.spotify_enabled:
+                # Fallback manual
+                if "track" in busqueda:
+                    return None, "⚠️ Spotify desactivado temporalmente. Por favor escribe el nombre de la canción."
+            else:
+                converted = await self.get_spotify_track_info(busqueda)
+                if converted: busqueda = converted
+
+        try:
+            return await self.search_track(busqueda)
+        except Exception as e:
+            return None, f"❌ Error al buscar: {e}"
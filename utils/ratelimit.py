@@ -0,0 +1,169 @@
+import os
+import time
+from discord import app_commands
+from discord.ext import commands
+from utils import metrics
+
+throttled = metrics.register(metrics.Counter("bot_throttled_total", "Peticiones frenadas por el limitador, por backend y ámbito"))
+
+# Límites por backend: {ámbito: (peticiones, segundos)}
+# "user" y "guild" son por id; "global" es uno solo para todo el bot.
+DEFAULT_LIMITS = {
+    "ollama": {"user": (3, 60), "guild": (10, 60), "global": (30, 60)},
+    "ytdl": {"user": (5, 30), "guild": (10, 30), "global": (60, 60)},
+    "render": {"user": (2, 60), "guild": (5, 60), "global": (20, 60)},
+}
+
+# Procesos del bot (lo fija launcher.py). Los cubos viven en memoria de cada
+# proceso, así que el cubo "global" se reparte entre ellos: con N workers cada
+# uno recibe 1/N del límite. Los de "guild" son exactos (un servidor siempre
+# cae en el mismo shard, y por tanto en el mismo worker); los de "user" son
+# por worker: alguien activo en servidores de varios workers puede llegar a
+# N veces su límite.
+WORKER_COUNT = int(os.getenv("WORKER_COUNT", "1"))
+
+MAX_BUCKETS = 10000 # A partir de aquí se purgan los buckets llenos (inactivos)
+
+
+class TokenBucket:
+    """Cubo de `rate` fichas que se rellena a razón de rate/per por segundo."""
+
+    def __init__(self, rate, per):
+        self.rate = rate
+        self.per = per
+        self.tokens = float(rate)
+        self.updated = time.monotonic()
+        self.last_used = self.updated # Última consulta (para expulsar los más viejos)
+
+    def _refill(self, now):
+        self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate / self.per)
+        self.updated = now
+
+    def retry_after(self, now):
+        """Segundos hasta que haya una ficha (0 si ya hay)."""
+        self.last_used = now
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) * self.per / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+    @property
+    def full(self):
+        return self.tokens >= self.rate
+
+
+def per_worker(limits, workers):
+    """Divide los límites globales entre los procesos (mínimo 1 petición)."""
+    if workers <= 1:
+        return limits
+    result = {}
+    for backend, scopes in limits.items():
+        result[backend] = dict(scopes)
+        if "global" in scopes:
+            rate, per = scopes["global"]
+            result[backend]["global"] = (max(1, rate // workers), per)
+    return result
+
+
+class RateLimiter:
+    """
+    Servicio de limitación compartido por todos los cogs. Cada backend caro
+    (Ollama, yt-dlp, renderizado de imágenes) tiene cubos por usuario, por
+    servidor y global; una petición solo pasa si hay ficha en los tres.
+    """
+
+    def __init__(self, limits=None, workers=WORKER_COUNT):
+        self.limits = per_worker(limits or DEFAULT_LIMITS, workers)
+        self.buckets = {}
+
+    def _bucket(self, backend, scope, key):
+        bucket_key = (backend, scope, key)
+        bucket = self.buckets.get(bucket_key)
+        if bucket is None:
+            if len(self.buckets) >= MAX_BUCKETS:
+                self._prune()
+            rate, per = self.limits[backend][scope]
+            bucket = self.buckets[bucket_key] = TokenBucket(rate, per)
+        return bucket
+
+    def _prune(self):
+        now = time.monotonic()
+        for key, bucket in list(self.buckets.items()):
+            bucket._refill(now)
+            if bucket.full:
+                del self.buckets[key]
+
+        # En plena raid casi ningún cubo está lleno: quitamos además los que
+        # llevan más tiempo sin usarse hasta quedarnos en la mitad
+        if len(self.buckets) >= MAX_BUCKETS:
+            oldest = sorted(self.buckets, key=lambda k: self.buckets[k].last_used)
+            for key in oldest[:len(self.buckets) - MAX_BUCKETS // 2]:
+                del self.buckets[key]
+
+    def acquire(self, backend, user_id=None, guild_id=None):
+        """
+        Intenta consumir una ficha. Devuelve (0, None) si pasa, o
+        (segundos_de_espera, ámbito) si algún cubo está vacío.
+        Solo se consume si pasan todos, así un usuario frenado por el global
+        no pierde sus propias fichas.
+        """
+        scopes = self.limits[backend]
+        keys = {"user": user_id, "guild": guild_id, "global": None}
+        now = time.monotonic()
+
+        buckets = []
+        for scope in scopes:
+            if scope != "global" and keys[scope] is None:
+                continue # Ej: mensajes directos no tienen guild
+            bucket = self._bucket(backend, scope, keys[scope])
+            wait = bucket.retry_after(now)
+            if wait:
+                throttled.inc(backend=backend, scope=scope)
+                return wait, scope
+            buckets.append(bucket)
+
+        for bucket in buckets:
+            bucket.take()
+        return 0.0, None
+
+    def cooldown_for(self, backend, scope):
+        rate, per = self.limits[backend][scope]
+        return rate, per
+
+
+limiter = RateLimiter()
+
+
+def check_app_limit(interaction, backend):
+    """
+    Consume una ficha o lanza CommandOnCooldown (lo atiende ErrorHandler).
+    Útil dentro del comando, después de validaciones baratas que no deben gastar fichas.
+    """
+    wait, scope = limiter.acquire(backend, interaction.user.id, interaction.guild_id)
+    if wait:
+        rate, per = limiter.cooldown_for(backend, scope)
+        raise app_commands.CommandOnCooldown(app_commands.Cooldown(rate, per), wait)
+
+
+def check_prefix_limit(ctx, backend):
+    """Igual que check_app_limit, para comandos con prefijo."""
+    wait, scope = limiter.acquire(backend, ctx.author.id, ctx.guild.id if ctx.guild else None)
+    if wait:
+        rate, per = limiter.cooldown_for(backend, scope)
+        bucket_type = commands.BucketType.guild if scope == "guild" else commands.BucketType.user
+        raise commands.CommandOnCooldown(commands.Cooldown(rate, per), wait, bucket_type)
+
+
+def app_limit(backend):
+    """
+    Check para slash commands. Los checks de app_commands se ejecutan de abajo
+    arriba: colocar este decorador ENCIMA de los de permisos, así quien no
+    tiene permiso no gasta fichas.
+    """
+    async def predicate(interaction):
+        check_app_limit(interaction, backend)
+        return True
+    return app_commands.check(predicate)
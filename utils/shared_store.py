@@ -0,0 +1,110 @@
+import asyncio
+import json
+import logging
+import os
+import time
+import aiosqlite
+
+logger = logging.getLogger("bot")
+
+# Ruta por defecto del almacén compartido entre procesos/shards
+DEFAULT_PATH = os.getenv("SHARED_STORE_PATH", "data/shared.db")
+PURGE_INTERVAL = 10 * 60 # Cada cuánto se borran de disco las entradas caducadas
+
+
+class SharedStore:
+    """
+    Almacén clave-valor local (SQLite en modo WAL) que comparten todos los
+    procesos del bot. Sirve para datos que no pueden vivir en un solo shard:
+    memoria de la IA, índice de búsquedas de música, totales de /botinfo...
+
+    Los valores se guardan como JSON dentro de un "namespace".
+    """
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self.db = None
+        self._task = None
+
+    async def open(self):
+        folder = os.path.dirname(self.path)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder)
+
+        self.db = await aiosqlite.connect(self.path)
+        # WAL: lectores y un escritor a la vez sin bloquearse entre procesos
+        await self.db.execute("PRAGMA journal_mode=WAL")
+        await self.db.execute("PRAGMA synchronous=NORMAL")
+        await self.db.execute("PRAGMA busy_timeout=5000")
+        await self.db.execute(
+            """CREATE TABLE IF NOT EXISTS kv (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                expires REAL,
+                PRIMARY KEY (namespace, key)
+            )"""
+        )
+        await self.db.execute("CREATE INDEX IF NOT EXISTS idx_kv_expires ON kv (expires)")
+        await self.db.commit()
+        self._task = asyncio.create_task(self._purge_loop())
+        return self
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        if self.db:
+            await self.db.close()
+            self.db = None
+
+    async def get(self, namespace, key, default=None):
+        async with self.db.execute(
+            "SELECT value, expires FROM kv WHERE namespace = ? AND key = ?",
+            (namespace, str(key))
+        ) as cursor:
+            row = await cursor.fetchone()
+
+        if row is None:
+            return default
+        value, expires = row
+        if expires is not None and expires < time.time():
+            return default
+        return json.loads(value)
+
+    async def set(self, namespace, key, value, ttl=None):
+        """Guarda un valor. ttl (segundos) opcional para entradas que caducan."""
+        expires = time.time() + ttl if ttl else None
+        await self.db.execute(
+            "INSERT OR REPLACE INTO kv (namespace, key, value, expires) VALUES (?, ?, ?, ?)",
+            (namespace, str(key), json.dumps(value), expires)
+        )
+        await self.db.commit()
+
+    async def delete(self, namespace, key):
+        await self.db.execute("DELETE FROM kv WHERE namespace = ? AND key = ?", (namespace, str(key)))
+        await self.db.commit()
+
+    async def items(self, namespace):
+        """Todas las entradas vigentes de un namespace: {key: value}"""
+        async with self.db.execute(
+            "SELECT key, value FROM kv WHERE namespace = ? AND (expires IS NULL OR expires >= ?)",
+            (namespace, time.time())
+        ) as cursor:
+            rows = await cursor.fetchall()
+        return {key: json.loads(value) for key, value in rows}
+
+    async def purge_expired(self):
+        """Borra las entradas caducadas (get/items ya las ignoran, esto libera disco)."""
+        cursor = await self.db.execute("DELETE FROM kv WHERE expires < ?", (time.time(),))
+        await self.db.commit()
+        return cursor.rowcount
+
+    async def _purge_loop(self):
+        # Con varios workers todos purgan; el DELETE es idempotente y barato con el índice
+        while True:
+            try:
+                await self.purge_expired()
+            except Exception as e:
+                logger.error(f"Error purgando el almacén compartido: {e}")
+            await asyncio.sleep(PURGE_INTERVAL)
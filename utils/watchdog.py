@@ -0,0 +1,117 @@
+import asyncio
+import logging
+import os
+import sys
+import sysconfig
+import threading
+import time
+import traceback
+from utils import metrics
+
+logger = logging.getLogger("bot")
+
+# Raíz del proyecto: para distinguir nuestro código del de librerías en el stack
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+COGS_DIR = os.path.join(PROJECT_ROOT, "cogs")
+
+# El venv suele vivir dentro del repo (venv/, .venv/): sus site-packages no son
+# código nuestro aunque cuelguen de PROJECT_ROOT. Se ignora cualquier ruta que
+# contenga al propio proyecto (p. ej. sys.prefix=/usr con el bot en /usr/src).
+_library_dirs = {sysconfig.get_paths()["purelib"], sysconfig.get_paths()["platlib"], sys.prefix, sys.base_prefix}
+LIBRARY_DIRS = tuple(
+    os.path.join(os.path.abspath(d), "")
+    for d in _library_dirs
+    if d and not os.path.join(PROJECT_ROOT, "").startswith(os.path.join(os.path.abspath(d), ""))
+)
+
+loop_stalls = metrics.register(metrics.Counter("bot_loop_stalls_total", "Bloqueos del event loop por punto de llamada"))
+stall_duration = metrics.register(metrics.Histogram("bot_loop_stall_seconds", "Duración de los bloqueos del event loop", buckets=(0.25, 0.5, 1, 2.5, 5, 10, 30, 60)))
+
+
+def _is_project_file(filename):
+    return filename.startswith(PROJECT_ROOT) and not filename.startswith(LIBRARY_DIRS) and filename != os.path.abspath(__file__)
+
+
+def _frame_name(frame):
+    code = frame.f_code
+    return getattr(code, "co_qualname", code.co_name) # co_qualname existe desde 3.11
+
+
+class LoopWatchdog:
+    """
+    Detecta cuándo el event loop lleva bloqueado más de `threshold` segundos.
+
+    - Una corrutina en el loop actualiza un "latido" cada `interval` segundos.
+    - Un hilo aparte comprueba el latido; si se retrasa, copia el stack del hilo
+      del loop (sys._current_frames) y lo loguea una sola vez por bloqueo.
+
+    Coste en reposo: un sleep corto en cada lado y una resta de floats.
+    """
+
+    def __init__(self, threshold=0.25, interval=0.1):
+        self.threshold = threshold
+        self.interval = interval
+        self.last_beat = time.monotonic()
+        self.loop_thread_id = None
+        self._heartbeat_task = None
+        self._thread = None
+        self._stop = threading.Event()
+
+    def start(self, loop):
+        self.loop_thread_id = threading.get_ident() # start() se llama desde el hilo del loop
+        self.last_beat = time.monotonic()
+        self._heartbeat_task = loop.create_task(self._heartbeat())
+        self._thread = threading.Thread(target=self._sampler, name="loop-watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._heartbeat_task:
+            self._heartbeat_task.cancel()
+
+    async def _heartbeat(self):
+        while True:
+            self.last_beat = time.monotonic()
+            await asyncio.sleep(self.interval)
+
+    def _sampler(self):
+        stalled_since = None
+        while not self._stop.wait(self.interval):
+            lag = time.monotonic() - self.last_beat
+            if lag > self.threshold:
+                if stalled_since is None:
+                    # Primer aviso del bloqueo: capturamos el stack ahora, que es cuando sirve
+                    stalled_since = self.last_beat
+                    self._report(lag)
+            elif stalled_since is not None:
+                # Entre dos latidos normales pasa `interval`; el resto es el bloqueo
+                duration = max(0.0, self.last_beat - stalled_since - self.interval)
+                stall_duration.observe(duration)
+                logger.warning(f"🐢 Event loop recuperado tras {duration * 1000:.0f}ms bloqueado")
+                stalled_since = None
+
+    def _report(self, lag):
+        frame = sys._current_frames().get(self.loop_thread_id)
+        if frame is None:
+            return
+
+        # Recorremos del frame más profundo hacia afuera
+        call_site = None # Línea nuestra más profunda (quien hace la llamada bloqueante)
+        activity = None # Función más externa dentro de cogs/ (el comando o listener)
+        current = frame
+        while current is not None:
+            filename = os.path.abspath(current.f_code.co_filename)
+            if _is_project_file(filename):
+                if call_site is None:
+                    call_site = f"{os.path.relpath(filename, PROJECT_ROOT)}:{current.f_lineno} ({_frame_name(current)})"
+                if filename.startswith(COGS_DIR):
+                    activity = _frame_name(current)
+            current = current.f_back
+
+        call_site = call_site or "externo"
+        loop_stalls.inc(site=call_site)
+        stack = "".join(traceback.format_stack(frame))
+        logger.warning(
+            f"⛔ Event loop bloqueado {lag * 1000:.0f}ms en {call_site} "
+            f"(comando/listener: {activity or 'desconocido'})\n{stack}"
+        )